@@ -0,0 +1,378 @@
+import re
+from array import array
+
+from .Opcodes import OPCODES_MAP
+from .Utils import transform_user_string_to_bytes, DEFAULT_STRING_ENCODINGS
+
+from .Bytecode import Bytecode, BytecodeFlag
+from .Prototype import Prototype, PrototypeFlag
+from .InstructionList import InstructionList
+from .GarbageCollectableConstant import GarbageCollectableConstant, GarbageCollectableConstantType
+from .ConstantTable import ConstantTable
+from .ConstantTableValue import ConstantTableValue, ConstantTableValueType
+
+# Assembler of .luas listings (see syntax.luas), output of Bytecode.serialize() is assembled back to same bytecode.
+# Listing is read line by line in single pass, prototypes are built directly
+
+# Value token: quoted string (with escapes) or anything up to whitespace, comma or comment
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_CODE = re.compile(rf'(?:[^;"]|{_STRING})*')
+_FUNCTION = re.compile(r'function\(([^)]*)\)$')
+_CONST = re.compile(r'\.const @(\d+) = (.*)$')
+_NUMBER = re.compile(r'\.number #(\d+) = (\S+)$')
+_UPVALUE = re.compile(r'\.upvalue \^(\d+) = ((?:local |readonly )*)(\d+)$')
+_TABLE_ENTRY = re.compile(rf'\[({_STRING}|[^\]]+)\] = ({_STRING}|\S+)$')
+_COMPLEX = re.compile(r'(\S+) \+ (\S+)i$')
+_INTEGER = re.compile(r'[+-]?\d+$')
+_ADD_FLAG = re.compile(r'\.AddFlag\((\w+)\)$')
+
+_PRIMITIVES = { "nil": 0, "false": 1, "true": 2, "!nil": 3 }
+
+_TABLE_PRIMITIVES = {
+  "nil": ConstantTableValueType.NIL,
+  "false": ConstantTableValueType.FALSE,
+  "true": ConstantTableValueType.TRUE,
+}
+
+# (shift, maximal value) of instruction arguments
+_FIELDS = { 'a': (8, 0xff), 'b': (24, 0xff), 'c': (16, 0xff), 'd': (16, 0xffff) }
+
+_PREFIXES = {
+  "var": "%",
+  "base": "%%",
+  "rbase": "%%",
+  "uv": "^",
+  "lit": "",
+  "lits": "",
+  "num": "#",
+  "str": "@",
+  "tab": "@",
+  "func": "@",
+  "cdata": "@",
+}
+
+_BYTECODE_FLAGS = { name: flag for name, flag in BytecodeFlag }
+
+_PROTOTYPE_FLAGS = {
+  "NoJIT": PrototypeFlag.NoJIT,
+  "PatchILOOP": PrototypeFlag.PatchILOOP,
+  "UsesFFI": PrototypeFlag.UsesFFi,
+}
+
+# Lookup table of mnemonics: opcode and (shift, maximal value, operand type, prefix) of every argument
+_INSTRUCTIONS = {
+  name.lower(): (info.value, tuple((*_FIELDS[k], v, _PREFIXES.get(v, "")) for k, v in info.arguments.items()))
+  for name, info in OPCODES_MAP.items()
+}
+
+# Prototype being assembled
+class _PrototypeState:
+  prototype: Prototype
+  words: array
+  labels: dict[str, int] # label -> index of instruction
+  fixups: list[tuple[int, int, int, str, int]] # (index of instruction, shift, maximal value, label, line number)
+  table: ConstantTable | None # table constant, which entries are being read
+
+  def __init__(self, prototype: Prototype) -> None:
+    self.prototype = prototype
+    self.words = array("I")
+    self.labels = {}
+    self.fixups = []
+    self.table = None
+
+class Assembler:
+  bytecode: Bytecode
+  encoding: str # encoding of text in string constants (escaped bytes are taken as is)
+
+  _stack: list[_PrototypeState]
+  _line_number: int
+
+  def __init__(self, encoding: str = None) -> None:
+    if encoding is None:
+      encoding = DEFAULT_STRING_ENCODINGS[0]
+
+    self.bytecode = Bytecode(flags=0)
+    self.encoding = encoding
+    self._stack = []
+    self._line_number = 0
+
+  # lines is iterable of lines (for example, opened file)
+  def assemble(self, lines) -> Bytecode:
+    stack = self._stack
+    instructions = _INSTRUCTIONS
+
+    for line_number, line in enumerate(lines, 1):
+      self._line_number = line_number
+
+      if ";" in line:
+        line = _CODE.match(line).group(0)
+      line = line.strip()
+      if not line:
+        continue
+
+      first = line[0]
+      if first == ".":
+        self._directive(line)
+      elif first == "[" or first == "}":
+        self._table_entry(line)
+      elif line[-1] == ":" or line.startswith("_entry:"):
+        self._label(line)
+      else:
+        # instruction
+        if not stack:
+          self._error("Instruction outside of function")
+        state = stack[-1]
+
+        mnemonic, _, operands = line.partition(" ")
+        instruction = instructions.get(mnemonic)
+        if instruction is None:
+          self._error(f"Unknown instruction ({mnemonic})")
+        word, arguments = instruction
+
+        operands = operands.split(",") if operands else ()
+        if len(operands) != len(arguments):
+          self._error(f"Expected {len(arguments)} operands, got {len(operands)}")
+
+        for operand, (shift, maximum, type, prefix) in zip(operands, arguments):
+          operand = operand.strip()
+          if type == "jump":
+            if operand[0] == "L":
+              state.fixups.append((len(state.words), shift, maximum, operand, line_number))
+              continue
+            value = self._jump(self._integer(operand) + 32767, maximum)
+          elif type == "pri":
+            value = _PRIMITIVES.get(operand)
+            if value is None:
+              self._error(f"Invalid primitive ({operand})")
+          else:
+            if not operand.startswith(prefix):
+              self._error(f"Expected operand with '{prefix}' prefix ({operand})")
+            value = self._integer(operand[len(prefix):])
+            if value < 0 or value > maximum:
+              self._error(f"Operand is out of range 0..{maximum} ({operand})")
+          word |= value << shift
+
+        state.words.append(word)
+
+    if self.bytecode.global_chunk is None:
+      self._error("No _entry function")
+    if len(stack) > 1:
+      self._error("Unexpected end of listing, .end is missing")
+    if stack:
+      # _entry function has no .end
+      self._end_function()
+
+    return self.bytecode
+
+  def _error(self, message: str):
+    raise ValueError(f"Line {self._line_number}: {message}")
+
+  def _integer(self, text: str) -> int:
+    try:
+      return int(text, 0)
+    except ValueError:
+      self._error(f"Invalid number ({text})")
+
+  # Checks biased jump offset
+  def _jump(self, value: int, maximum: int) -> int:
+    if value < 0 or value > maximum:
+      self._error(f"Jump offset is out of range {-32767}..{maximum - 32767} ({value - 32767})")
+    return value
+
+  def _string(self, text: str) -> bytes:
+    try:
+      return self.bytecode.string_pool.intern(transform_user_string_to_bytes(text[1:-1], self.encoding))
+    except ValueError as e:
+      self._error(str(e))
+
+  def _label(self, line: str):
+    if line.startswith("_entry:"):
+      if self.bytecode.global_chunk is not None or self._stack:
+        self._error("Duplicate _entry")
+      prototype = self._begin_function(line[len("_entry:"):].strip())
+      self.bytecode.global_chunk = prototype
+      return
+
+    if not self._stack:
+      self._error("Label outside of function")
+    state = self._stack[-1]
+    label = line[:-1]
+    if label in state.labels:
+      self._error(f"Duplicate label ({label})")
+    state.labels[label] = len(state.words)
+
+  def _begin_function(self, signature: str) -> Prototype:
+    match = _FUNCTION.match(signature)
+    if match is None:
+      self._error(f"Invalid function signature ({signature})")
+
+    prototype = Prototype(parent_bytecode=self.bytecode)
+    parameters = [parameter.strip() for parameter in match.group(1).split(",") if parameter.strip()]
+    if parameters and parameters[-1] == "...":
+      prototype.flags |= PrototypeFlag.VarArg
+      parameters.pop()
+    prototype.parameters_number = len(parameters)
+
+    self._stack.append(_PrototypeState(prototype))
+    return prototype
+
+  def _end_function(self):
+    state = self._stack.pop()
+    prototype = state.prototype
+
+    for index, shift, maximum, label, line_number in state.fixups:
+      self._line_number = line_number
+      target = state.labels.get(label)
+      if target is None:
+        # labels of listing are L<index of instruction>, jumps outside of function have no label line
+        target = self._integer(label[1:])
+      state.words[index] |= self._jump(target - index + 32767, maximum) << shift
+
+    instructions = InstructionList()
+    instructions.words = state.words
+    prototype.instructions = instructions
+
+    if prototype.child_prototypes:
+      prototype.flags |= PrototypeFlag.HaveChilds
+
+  def _directive(self, line: str):
+    name = line[1:].split(" ", 1)[0]
+
+    # directives of bytecode (before _entry)
+    if not self._stack:
+      if name == "luajit":
+        self.bytecode.version = self._integer(line[len(".luajit"):].strip())
+      elif name in _BYTECODE_FLAGS:
+        self.bytecode.flags |= _BYTECODE_FLAGS[name]
+      elif name.startswith("AddFlag"):
+        match = _ADD_FLAG.match(line)
+        if match is None:
+          self._error(f"Invalid directive ({line})")
+        self.bytecode.flags |= self._integer(match.group(1))
+      elif name == "end" and self.bytecode.global_chunk is not None:
+        self._error("Unexpected .end")
+      else:
+        self._error(f"Unknown directive ({line})")
+      return
+
+    state = self._stack[-1]
+    prototype = state.prototype
+    if state.table is not None:
+      self._error("Unterminated table constant")
+
+    if name == "const":
+      self._const(state, line)
+    elif name == "number":
+      match = _NUMBER.match(line)
+      if match is None:
+        self._error(f"Invalid .number ({line})")
+      self._check_index(int(match.group(1)), prototype.nm_constants)
+      value = match.group(2)
+      try:
+        prototype.nm_constants.append(int(value) if _INTEGER.match(value) else float(value))
+      except ValueError:
+        self._error(f"Invalid number ({value})")
+    elif name == "upvalue":
+      match = _UPVALUE.match(line)
+      if match is None:
+        self._error(f"Invalid .upvalue ({line})")
+      self._check_index(int(match.group(1)), prototype.upvalues)
+      upvalue = int(match.group(3))
+      if "local" in match.group(2):
+        upvalue |= 0x8000
+      if "readonly" in match.group(2):
+        upvalue |= 0x4000
+      prototype.upvalues.append(upvalue)
+    elif name == "framesize":
+      prototype.frame_size = self._integer(line[len(".framesize"):].strip())
+    elif name in _PROTOTYPE_FLAGS:
+      prototype.flags |= _PROTOTYPE_FLAGS[name]
+    elif name == "end":
+      self._end_function()
+    else:
+      self._error(f"Unknown directive ({line})")
+
+  def _check_index(self, index: int, constants: list):
+    if index != len(constants):
+      self._error(f"Expected constant with index {len(constants)}, got {index}")
+
+  def _const(self, state: _PrototypeState, line: str):
+    match = _CONST.match(line)
+    if match is None:
+      self._error(f"Invalid .const ({line})")
+
+    prototype = state.prototype
+    self._check_index(int(match.group(1)), prototype.gc_constants)
+    value = match.group(2).strip()
+
+    gck = GarbageCollectableConstant(parent_prototype=prototype)
+    if value.startswith("function"):
+      child = self._begin_function(value)
+      child.parent_prototype = prototype
+      prototype.child_prototypes.append(child)
+      gck.type = GarbageCollectableConstantType.CHILD
+      gck.value = child
+    elif value[0] == "{":
+      gck.type = GarbageCollectableConstantType.TABLE
+      gck.value = ConstantTable(string_pool=self.bytecode.string_pool)
+      if value != "{}":
+        if value != "{":
+          self._error(f"Invalid table ({value})")
+        state.table = gck.value
+    elif value[0] == "\"":
+      gck.type = GarbageCollectableConstantType.STRING
+      gck.value = self._string(value)
+    elif value.endswith("ULL"):
+      gck.type = GarbageCollectableConstantType.UINT64
+      gck.value = self._integer(value[:-3])
+    elif value.endswith("LL"):
+      gck.type = GarbageCollectableConstantType.INT64
+      gck.value = self._integer(value[:-2])
+    else:
+      complex_match = _COMPLEX.match(value)
+      if complex_match is None:
+        self._error(f"Invalid constant ({value})")
+      try:
+        gck.type = GarbageCollectableConstantType.COMPLEX
+        gck.value = complex(float(complex_match.group(1)), float(complex_match.group(2)))
+      except ValueError:
+        self._error(f"Invalid complex number ({value})")
+
+    prototype.gc_constants.append(gck)
+
+  def _table_entry(self, line: str):
+    state = self._stack[-1] if self._stack else None
+    if state is None or state.table is None:
+      self._error("Table entry outside of table constant")
+    table = state.table
+
+    if line == "}":
+      state.table = None
+      return
+
+    match = _TABLE_ENTRY.match(line)
+    if match is None:
+      self._error(f"Invalid table entry ({line})")
+    key, value = match.group(1), match.group(2)
+
+    # entries of array part are written first, with indices 0, 1, 2...
+    if len(table.hash) == 0 and key == str(len(table.array)):
+      table.array.append(self._table_value(value))
+    else:
+      table.hash.append((self._table_value(key), self._table_value(value)))
+
+  def _table_value(self, text: str) -> ConstantTableValue:
+    value = ConstantTableValue(string_pool=self.bytecode.string_pool)
+    if text[0] == "\"":
+      value.type = ConstantTableValueType.STRING
+      value.value = self._string(text)
+    elif text in _TABLE_PRIMITIVES:
+      value.type = _TABLE_PRIMITIVES[text]
+    else:
+      value.value = self._integer(text)
+      value.type = ConstantTableValueType.INT32 if 0 <= value.value <= 0xFFFFFFFF else ConstantTableValueType.INT64
+    return value
+
+# Assemble listing (iterable of lines, for example opened file)
+def assemble(lines, encoding: str = None) -> Bytecode:
+  return Assembler(encoding).assemble(lines)
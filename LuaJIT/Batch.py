@@ -0,0 +1,250 @@
+import glob
+import os
+import sys
+import time
+from functools import partial
+
+from .Bytecode import Bytecode
+from .ByteStreamReader import ByteStreamReader
+from .DisassemblyCache import DisassemblyCache
+from .SerializeOptions import SerializeOptions
+from .Profiler import PROFILER
+
+DEFAULT_EXTENSIONS = (".luac",)
+
+class BatchResult:
+  input_file_name: str
+  output_file_name: str
+  size: int # size of input file
+  cached: bool # output was taken from cache
+  error: str | None
+  phases: dict | None # Profiler.to_dict() of this file, if profiling is enabled
+
+  def __init__(self, input_file_name: str, output_file_name: str, size: int = 0, cached: bool = False, error: str = None) -> None:
+    self.input_file_name = input_file_name
+    self.output_file_name = output_file_name
+    self.size = size
+    self.cached = cached
+    self.error = error
+    self.phases = None
+
+class BatchSummary:
+  files: int
+  failed: int
+  cached: int
+  size: int # total size of successfully disassembled files
+  elapsed: float # in seconds
+  action: str # what was done with files, shown in summary
+  uses_cache: bool # number of files taken from cache is shown in summary
+
+  def __init__(self, action: str = "disassembled", uses_cache: bool = True) -> None:
+    self.action = action
+    self.uses_cache = uses_cache
+    self.files = 0
+    self.failed = 0
+    self.cached = 0
+    self.size = 0
+    self.elapsed = 0.0
+
+  def add(self, result: BatchResult):
+    self.files += 1
+    if result.error is not None:
+      self.failed += 1
+    else:
+      self.size += result.size
+      if result.cached:
+        self.cached += 1
+
+  def __str__(self) -> str:
+    elapsed = max(self.elapsed, 1e-9)
+    cached = f", {self.cached} from cache" if self.uses_cache else ""
+    return (f"{self.files - self.failed}/{self.files} files {self.action} ({self.failed} failed{cached}) "
+            f"in {self.elapsed:.2f}s: {self.size / elapsed / (1024 * 1024):.2f} MB/s, {self.files / elapsed:.1f} files/s")
+
+# Disassemble single file. Returns size of input file and whether output was taken from cache.
+# If incremental is True, listings of prototypes are stored in manifest next to output file
+# and only prototypes changed since previous disassembly are decoded and rendered
+def disassemble_file(input_file_name: str, output_file_name: str = None, cache: DisassemblyCache = None, options: SerializeOptions = None,
+                     incremental: bool = False) -> tuple[int, bool]:
+  if output_file_name is None:
+    output_file_name = input_file_name + ".luas"
+
+  bytecode = Bytecode()
+  with ByteStreamReader.open(input_file_name) as file_content:
+    size = len(file_content.data)
+
+    if cache is not None:
+      key = cache.key(file_content.data, options.key() if options is not None else "")
+      if cache.copy_listing(key, output_file_name):
+        return size, True
+
+    if incremental:
+      _disassemble_incremental(file_content, output_file_name, options)
+    else:
+      bytecode.read(file_content)
+
+  if not incremental:
+    with open(output_file_name, "w", encoding="utf-8") as f:
+      bytecode.serialize_to(f.write, "", options)
+
+  if cache is not None:
+    cache.put_listing_file(key, output_file_name)
+
+  return size, False
+
+def _disassemble_incremental(file_content: ByteStreamReader, output_file_name: str, options: SerializeOptions = None):
+  # imported here, because it's not needed for usual disassembly
+  from .ListingManifest import ListingManifest, MANIFEST_EXTENSION
+
+  if options is None:
+    options = SerializeOptions()
+  manifest_file_name = output_file_name + MANIFEST_EXTENSION
+  manifest = ListingManifest.load(manifest_file_name, options.key())
+
+  # prototypes are decoded only if their listings are not in manifest
+  bytecode = Bytecode()
+  bytecode.read(file_content, lazy=True)
+  manifest.add_bytecode(bytecode, file_content.data)
+
+  options = SerializeOptions(options.labels, options.annotate, options.encodings, manifest)
+  with open(output_file_name, "w", encoding="utf-8") as f:
+    bytecode.serialize_to(f.write, "", options)
+
+  manifest.save(manifest_file_name)
+
+# Find input files by list of files, directories and glob patterns.
+# Returns list of (input file name, output file name).
+# Raises ValueError if different input files would be written to same output file
+def collect_files(paths: list[str], output_directory: str = None, extensions: tuple[str] = DEFAULT_EXTENSIONS) -> list[tuple[str, str]]:
+  # (input file, directory its output name is relative to)
+  inputs = []
+
+  for path in paths:
+    if os.path.isdir(path):
+      for root, _, file_names in os.walk(path):
+        for file_name in sorted(file_names):
+          if file_name.endswith(extensions):
+            inputs.append((os.path.join(root, file_name), path))
+    elif glob.has_magic(path):
+      base = _glob_base(path)
+      for input_file_name in sorted(glob.glob(path, recursive=True)):
+        if os.path.isfile(input_file_name):
+          inputs.append((input_file_name, base))
+    else:
+      inputs.append((path, os.path.dirname(path)))
+
+  # output names are relative to common root of all paths, so files from different paths don't overwrite each other
+  if output_directory is not None and inputs:
+    common_root = os.path.commonpath([os.path.abspath(base) for _, base in inputs])
+
+  jobs = []
+  seen_inputs = set()
+  outputs = {}
+  for input_file_name, base in inputs:
+    absolute_name = os.path.abspath(input_file_name)
+    if absolute_name in seen_inputs:
+      continue
+    seen_inputs.add(absolute_name)
+
+    if output_directory is None:
+      output_file_name = input_file_name + ".luas"
+    else:
+      output_file_name = os.path.join(output_directory, os.path.relpath(absolute_name, common_root) + ".luas")
+
+    key = os.path.normcase(os.path.abspath(output_file_name))
+    if key in outputs:
+      raise ValueError(f"Files {outputs[key]} and {input_file_name} have same output file {output_file_name}")
+    outputs[key] = input_file_name
+    jobs.append((input_file_name, output_file_name))
+
+  return jobs
+
+# Leading part of glob pattern without wildcards
+def _glob_base(pattern: str) -> str:
+  parts = []
+  head = pattern
+  while True:
+    head, tail = os.path.split(head)
+    if not tail:
+      break
+    parts.insert(0, tail)
+  base = head
+  for part in parts:
+    if glob.has_magic(part):
+      break
+    base = os.path.join(base, part)
+  return base
+
+def _disassemble_job(job: tuple[str, str], cache: DisassemblyCache = None, options: SerializeOptions = None, incremental: bool = False) -> BatchResult:
+  input_file_name, output_file_name = job
+  try:
+    output_directory = os.path.dirname(output_file_name)
+    if output_directory:
+      os.makedirs(output_directory, exist_ok=True)
+    size, cached = disassemble_file(input_file_name, output_file_name, cache, options, incremental)
+    return BatchResult(input_file_name, output_file_name, size, cached)
+  except Exception as e:
+    return BatchResult(input_file_name, output_file_name, error=f"{type(e).__name__}: {e}")
+
+# Run job with profiler enabled (in worker process it's enabled on first job).
+# Phases of job are sent back in result and merged in the main process
+def _profiled_job(job: tuple[str, str], job_function, trace_memory: bool = False) -> BatchResult:
+  if not PROFILER.enabled:
+    PROFILER.enable(trace_memory)
+
+  # in main process (single worker) profiler already has phases of other files
+  phases = PROFILER.phases
+  PROFILER.reset()
+  try:
+    result = job_function(job)
+    result.phases = PROFILER.to_dict()
+  finally:
+    PROFILER.phases = phases
+  return result
+
+# Disassemble files in worker processes.
+# on_result is called (in this process) for every finished file.
+# job_function replaces disassembly: it takes job and returns BatchResult (must be picklable, so top-level function)
+def run_batch(jobs: list[tuple[str, str]], workers: int = None, chunksize: int = 1, on_result = None, cache: DisassemblyCache = None, options: SerializeOptions = None,
+              job_function = None, action: str = "disassembled", incremental: bool = False) -> BatchSummary:
+  # only disassembly uses cache
+  summary = BatchSummary(action, uses_cache=job_function is None)
+  start = time.perf_counter()
+
+  if job_function is None:
+    job = partial(_disassemble_job, cache=cache, options=options, incremental=incremental)
+  else:
+    job = job_function
+  # phases of files are collected in processes, that disassemble them
+  if PROFILER.enabled:
+    job = partial(_profiled_job, job_function=job, trace_memory=PROFILER.trace_memory)
+
+  if workers == 1:
+    results = map(job, jobs)
+    executor = None
+  else:
+    # imported here to not slow down start of single file disassembly
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=workers)
+    results = executor.map(job, jobs, chunksize=chunksize)
+
+  try:
+    for result in results:
+      summary.add(result)
+      if result.phases is not None:
+        PROFILER.merge(result.phases)
+      if on_result is not None:
+        on_result(result)
+  finally:
+    if executor is not None:
+      executor.shutdown()
+
+  if cache is not None:
+    cache.evict()
+
+  summary.elapsed = time.perf_counter() - start
+  return summary
+
+def print_result(result: BatchResult):
+  if result.error is not None:
+    print(f"error: {result.input_file_name}: {result.error}", file=sys.stderr)
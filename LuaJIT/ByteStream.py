@@ -1,30 +1,33 @@
 from .Types import IByteStream
 from .Utils import normalize_number_sign
 
-def concat_bytes_to_number(data: bytes):
-  result = 0
-  offset = 0
-  for b in data:
-    result |= b << offset
-    offset += 8
-  return result
+def concat_bytes_to_number(data: bytes, big_endian: bool = False):
+  return int.from_bytes(data, "big" if big_endian else "little")
+
+def transorm_number_to_bytes(number: int, bytes_count: int, big_endian: bool = False):
+  return bytearray(number.to_bytes(bytes_count, "big" if big_endian else "little"))
 
-def transorm_number_to_bytes(number: int, bytes_count: int):
+def encode_uleb128(value: int) -> bytearray:
   result = bytearray()
-  for i in range(bytes_count):
-    result.append((number >> (i*8)) & 0xff)
+  value &= 0xFFFFFFFF
+  while value >= 0x80:
+    result.append((value & 0x7f) | 0x80)
+    value >>= 7
+  result.append(value)
   return result
 
 class ByteStream(IByteStream):
   data: bytearray
   pointer: int
+  big_endian: bool
 
-  def __init__(self, data = None) -> None:
+  def __init__(self, data = None, big_endian: bool = False) -> None:
     if data is not None:
       self.data = bytearray(data)
     else:
       self.data = bytearray()
     self.pointer = 0
+    self.big_endian = big_endian
 
   def read_bytes(self, number_of_bytes: int) -> bytes:
     value = self.data[self.pointer:self.pointer + number_of_bytes]
@@ -42,20 +45,20 @@ class ByteStream(IByteStream):
       return value
     
   def read_word(self) -> int:
-    return concat_bytes_to_number(self.read_bytes(2))
+    return concat_bytes_to_number(self.read_bytes(2), self.big_endian)
   
   def read_word_signed(self) -> int:
-    value = concat_bytes_to_number(self.read_bytes(2))
+    value = concat_bytes_to_number(self.read_bytes(2), self.big_endian)
     if value & 0x8000:
       return normalize_number_sign(value, 2)
     else:
       return value
     
   def read_dword(self) -> int:
-    return concat_bytes_to_number(self.read_bytes(4))
+    return concat_bytes_to_number(self.read_bytes(4), self.big_endian)
     
   def read_dword_signed(self) -> int:
-    value = concat_bytes_to_number(self.read_bytes(4))
+    value = concat_bytes_to_number(self.read_bytes(4), self.big_endian)
     if value & 0x80000000:
       return normalize_number_sign(value, 4)
     else:
@@ -104,32 +107,37 @@ class ByteStream(IByteStream):
     else:
       return value, mark
 
+  # Writes insert data at pointer, so appending to the end is the fast path
   def write_bytes(self, data: bytes):
-    for byte in data:
-      self.write_byte(byte)
+    pointer = self.pointer
+    if pointer == len(self.data):
+      self.data += data
+    else:
+      self.data[pointer:pointer] = data
+    self.pointer = pointer + len(data)
 
   def write_byte(self, value: int):
-    self.data.insert(self.pointer, value)
+    if self.pointer == len(self.data):
+      self.data.append(value)
+    else:
+      self.data.insert(self.pointer, value)
     self.pointer += 1
 
   def write_word(self, value: int):
-    self.write_bytes(transorm_number_to_bytes(value, 2))
+    self.write_bytes((value & 0xFFFF).to_bytes(2, "big" if self.big_endian else "little"))
 
   def write_dword(self, value: int):
-    self.write_bytes(transorm_number_to_bytes(value, 4))
+    self.write_bytes((value & 0xFFFFFFFF).to_bytes(4, "big" if self.big_endian else "little"))
 
   def write_uleb128(self, value: int):
-    value &= 0xFFFFFFFF
-    while value >= 0x80:
-      self.write_byte((value & 0x7f) | 0x80)
-      value >>= 7
-    self.write_byte(value)
+    self.write_bytes(encode_uleb128(value))
 
   def write_uleb128_33(self, value: int, mark: bool):
     value &= 0xFFFFFFFF
     if value >= 0x40:
-      self.write_byte(((value & 0x3f) << 1) | 0x80 | mark)
-      value >>= 6
-      self.write_uleb128(value)
+      encoded = bytearray()
+      encoded.append(((value & 0x3f) << 1) | 0x80 | mark)
+      encoded += encode_uleb128(value >> 6)
+      self.write_bytes(encoded)
     else:
-      self.write_byte(((value & 0x3f) << 1) | mark)
\ No newline at end of file
+      self.write_byte(((value & 0x3f) << 1) | mark)
@@ -0,0 +1,178 @@
+import io
+import mmap
+import struct
+
+from .Types import IByteStream
+from .Utils import normalize_number_sign
+
+_BYTE_SIGNED = struct.Struct("<b")
+
+# (word, signed word, dword, signed dword) for each byte order
+_LITTLE_ENDIAN_STRUCTS = tuple(struct.Struct("<" + f) for f in "HhIi")
+_BIG_ENDIAN_STRUCTS = tuple(struct.Struct(">" + f) for f in "HhIi")
+
+# Read-only bytestream over memoryview.
+# Unlike ByteStream, it never copies the input: integers are decoded in place
+# and only read_bytes() creates new object (exactly of requested size)
+class ByteStreamReader(IByteStream):
+  data: memoryview
+  pointer: int
+
+  _mapping: mmap.mmap | None
+  _big_endian: bool
+  _structs: tuple[struct.Struct, struct.Struct, struct.Struct, struct.Struct]
+
+  def __init__(self, data = None, big_endian: bool = False) -> None:
+    if data is None:
+      data = b""
+
+    self.data = memoryview(data).cast("B")
+    self.pointer = 0
+    self._mapping = None
+    self.big_endian = big_endian
+
+  @property
+  def big_endian(self) -> bool:
+    return self._big_endian
+
+  # Byte order is chosen once, so reads don't have to check it
+  @big_endian.setter
+  def big_endian(self, value: bool):
+    self._big_endian = bool(value)
+    self._structs = _BIG_ENDIAN_STRUCTS if value else _LITTLE_ENDIAN_STRUCTS
+
+  # Open file and map it into memory (if possible)
+  @classmethod
+  def open(cls, file_name: str):
+    with open(file_name, "rb") as f:
+      try:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      except ValueError:
+        # empty files can't be mapped
+        return cls(f.read())
+
+    stream = cls(mapping)
+    stream._mapping = mapping
+    return stream
+
+  def close(self):
+    self.data.release()
+    if self._mapping is not None:
+      self._mapping.close()
+      self._mapping = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def _advance(self, number_of_bytes: int) -> int:
+    position = self.pointer
+    if position + number_of_bytes > len(self.data):
+      raise EOFError(f"Unexpected end of data (trying to read {number_of_bytes} bytes at {position})")
+    self.pointer = position + number_of_bytes
+    return position
+
+  # Returns view to next bytes without copying them
+  def read_view(self, number_of_bytes: int) -> memoryview:
+    position = self._advance(number_of_bytes)
+    return self.data[position:position + number_of_bytes]
+
+  def read_bytes(self, number_of_bytes: int) -> bytes:
+    position = self._advance(number_of_bytes)
+    return self.data[position:position + number_of_bytes].tobytes()
+
+  def read_byte(self) -> int:
+    return self.data[self._advance(1)]
+
+  def read_byte_signed(self) -> int:
+    return _BYTE_SIGNED.unpack_from(self.data, self._advance(1))[0]
+
+  def read_word(self) -> int:
+    return self._structs[0].unpack_from(self.data, self._advance(2))[0]
+
+  def read_word_signed(self) -> int:
+    return self._structs[1].unpack_from(self.data, self._advance(2))[0]
+
+  def read_dword(self) -> int:
+    return self._structs[2].unpack_from(self.data, self._advance(4))[0]
+
+  def read_dword_signed(self) -> int:
+    return self._structs[3].unpack_from(self.data, self._advance(4))[0]
+
+  def read_uleb128(self) -> int:
+    data = self.data
+    pointer = self.pointer
+    try:
+      value = data[pointer]
+      pointer += 1
+      if value >= 0x80:
+        value &= 0x7f
+        offset = 7
+        while True:
+          new_byte = data[pointer]
+          pointer += 1
+          value |= (new_byte & 0x7f) << offset
+          offset += 7
+          if new_byte < 0x80:
+            break
+    except IndexError:
+      raise EOFError(f"Unexpected end of data (reading uleb128 at {self.pointer})") from None
+    self.pointer = pointer
+    return value
+
+  def read_uleb128_signed(self) -> int:
+    value = self.read_uleb128()
+    if value & 0x80000000:
+      return normalize_number_sign(value, 4)
+    else:
+      return value
+
+  def read_uleb128_33(self) -> tuple[int, bool]:
+    data = self.data
+    pointer = self.pointer
+    try:
+      value = data[pointer]
+      pointer += 1
+      mark = value & 1
+      value >>= 1
+      if value >= 0x40:
+        value &= 0x3f
+        offset = 6
+        while True:
+          new_byte = data[pointer]
+          pointer += 1
+          value |= (new_byte & 0x7f) << offset
+          offset += 7
+          if new_byte < 0x80:
+            break
+    except IndexError:
+      raise EOFError(f"Unexpected end of data (reading uleb128 at {self.pointer})") from None
+    self.pointer = pointer
+    return value, mark
+
+  def read_uleb128_33_signed(self) -> tuple[int, bool]:
+    value, mark = self.read_uleb128_33()
+    if value & 0x80000000:
+      return normalize_number_sign(value, 4), mark
+    else:
+      return value, mark
+
+  def write_bytes(self, data: bytes):
+    raise io.UnsupportedOperation("ByteStreamReader is read-only")
+
+  def write_byte(self, value: int):
+    raise io.UnsupportedOperation("ByteStreamReader is read-only")
+
+  def write_word(self, value: int):
+    raise io.UnsupportedOperation("ByteStreamReader is read-only")
+
+  def write_dword(self, value: int):
+    raise io.UnsupportedOperation("ByteStreamReader is read-only")
+
+  def write_uleb128(self, value: int):
+    raise io.UnsupportedOperation("ByteStreamReader is read-only")
+
+  def write_uleb128_33(self, value: int, mark: bool):
+    raise io.UnsupportedOperation("ByteStreamReader is read-only")
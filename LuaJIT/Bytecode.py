@@ -1,9 +1,11 @@
-from .Types import BytesWritable, BytesInitializable, Serializable
+from .SerializeOptions import SerializeOptions
+from .Types import BytesWritable, BytesInitializable, StreamSerializable
 from .Enum import Enum
-from .Utils import indent_string
 
 from .ByteStream import ByteStream
 from .Prototype import Prototype
+from .StringPool import StringPool
+from .Profiler import PROFILER
 
 class BytecodeFlag(Enum):
   BigEndian       = 0x01
@@ -11,10 +13,12 @@ class BytecodeFlag(Enum):
   UsesFFI         = 0x04
   x64Bit          = 0x08
 
-class Bytecode(BytesWritable, BytesInitializable, Serializable):
+class Bytecode(BytesWritable, BytesInitializable, StreamSerializable):
   version: int
   flags: BytecodeFlag
   global_chunk: Prototype
+  chunk_name: bytes # only in not stripped bytecode
+  string_pool: StringPool # shared by all string constants of bytecode
 
   _prototypes_stack: list[Prototype]
 
@@ -30,32 +34,45 @@ class Bytecode(BytesWritable, BytesInitializable, Serializable):
     self.version = version
     self.flags = flags
     self.global_chunk = global_chunk
+    self.chunk_name = b""
+    self.string_pool = StringPool()
     self._prototypes_stack = []
 
     if data is not None:
       BytesInitializable.__init__(self, data)
 
   def write(self, output: ByteStream):
+    with PROFILER.phase("write"):
+      self._write(output)
+
+  def _write(self, output: ByteStream):
     output.write_bytes(b"\x1BLJ")
     output.write_byte(self.version)
     output.write_uleb128(self.flags)
 
-    self.global_chunk.write(output)
+    if not self.flags & BytecodeFlag.StripDebugInfo:
+      output.write_uleb128(len(self.chunk_name))
+      output.write_bytes(self.chunk_name)
 
-    output.write_byte(0)
+    # byte order of stream is changed only while prototypes are written
+    big_endian = output.big_endian
+    output.big_endian = bool(self.flags & BytecodeFlag.BigEndian)
+    try:
+      self.global_chunk.write(output)
+    finally:
+      output.big_endian = big_endian
 
-  def read(self, input: ByteStream):
-    header = input.read_bytes(3)
-    if header != b"\x1bLJ":
-      print(f"invalid header ({header})")
-      return
+    output.write_byte(0)
 
-    self.version = input.read_byte()
-    self.flags = input.read_uleb128()
+  # If lazy is True, prototypes are decoded on first access to their
+  # instructions, upvalues or constants. Input must be available until then
+  def read(self, input: ByteStream, lazy: bool = False):
+    with PROFILER.phase("header"):
+      self.read_header(input)
 
     while True:
       prototype = Prototype(parent_bytecode=self)
-      if not prototype.read(input):
+      if not prototype.read(input, lazy):
         break
       self._prototypes_stack.append(prototype)
 
@@ -64,15 +81,59 @@ class Bytecode(BytesWritable, BytesInitializable, Serializable):
     self.global_chunk = self._prototypes_stack[-1]
     self._prototypes_stack.clear()
 
-  def serialize(self) -> str:
-    result = ""
+  # Read header of bytecode (before prototypes)
+  def read_header(self, input: ByteStream):
+    header = input.read_bytes(3)
+    if header != b"\x1bLJ":
+      raise ValueError(f"Invalid header ({header})")
 
-    result += f".luajit {self.version if self.version < 0x80 else hex(self.version).capitalize()}\n"
+    self.version = input.read_byte()
+    self.flags = input.read_uleb128()
+    # instructions, upvalues and line info are stored in byte order of machine, that made bytecode
+    input.big_endian = bool(self.flags & BytecodeFlag.BigEndian)
+
+    if not self.flags & BytecodeFlag.StripDebugInfo:
+      self.chunk_name = input.read_bytes(input.read_uleb128())
+
+  # All prototypes (childs before their parents, same order as in bytecode)
+  def prototypes(self):
+    def walk(prototype: Prototype):
+      for child in prototype.child_prototypes:
+        yield from walk(child)
+      yield prototype
+
+    if self.global_chunk is not None:
+      yield from walk(self.global_chunk)
+
+  # Structured export for other tools (see BytecodeExport).
+  # write is text sink for export_ndjson() and binary sink for export_binary()
+  def export_ndjson(self, write):
+    from .BytecodeExport import export_ndjson
+    export_ndjson(self, write)
+
+  def export_binary(self, write):
+    from .BytecodeExport import export_binary
+    export_binary(self, write)
+
+  # Load bytecode from result of export_binary() (bytes-like object, for example mmap)
+  @classmethod
+  def from_binary(cls, data):
+    from .BytecodeExport import import_binary
+    return import_binary(data)
+
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
+    with PROFILER.phase("serialize"):
+      self._serialize_to(write, indent, options)
+
+  def _serialize_to(self, write, indent: str, options: SerializeOptions):
+    new_line = "\n" + indent
+
+    write(f".luajit {self.version if self.version < 0x80 else hex(self.version).capitalize()}{new_line}")
     
     flags = self.flags
     for flag_name, flag in BytecodeFlag:
       if flags & flag:
-        result += f".{flag_name}\n"
+        write(f".{flag_name}{new_line}")
         # remove this flag
         flags &= ~flag
 
@@ -86,10 +147,9 @@ class Bytecode(BytesWritable, BytesInitializable, Serializable):
         if not flags & 1:
           continue
 
-        result += f".AddFlag({hex(1 << offset).capitalize()})\n"
-
-    result += "\n"
-    result += indent_string("_entry:\n" + self.global_chunk.serialize())
-    result += "\n"
+        write(f".AddFlag({hex(1 << offset).capitalize()}){new_line}")
 
-    return result
+    write(new_line)
+    write(f"_entry: {self.global_chunk.signature()}{new_line}  ")
+    self.global_chunk.serialize_to(write, indent + "  ", options)
+    write(new_line)
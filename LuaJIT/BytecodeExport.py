@@ -0,0 +1,415 @@
+import json
+import math
+import struct
+import sys
+from array import array
+
+from .Bytecode import Bytecode, BytecodeFlag
+from .Prototype import Prototype
+from .InstructionList import InstructionList
+from .GarbageCollectableConstant import GarbageCollectableConstant, GarbageCollectableConstantType
+from .ConstantTable import ConstantTable
+from .ConstantTableValue import ConstantTableValue, ConstantTableValueType
+from .DebugInfo import DebugInfo
+from .ByteStream import ByteStream
+from .Utils import normalize_number_sign, interpret_float_as_int, interpret_int_as_float, interpret_ints_as_floats
+
+# Binary export is sequence of sections after header. Every section is
+#   tag (4 bytes), reserved (4 bytes), length of payload (8 bytes), payload, padding to 8 bytes
+# Payloads are little-endian columns, so they can be used in place (memoryview.cast, numpy.frombuffer)
+BINARY_MAGIC = b"LJBX"
+BINARY_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sII") # magic, format version, number of sections
+_SECTION_HEADER = struct.Struct("<4sIQ")
+_BYTECODE_INFO = struct.Struct("<IIII") # version, flags, number of prototypes, reserved
+
+# Columns of prototypes table (one u32 column per field, in this order)
+PROTOTYPE_COLUMNS = (
+  "flags", "parameters_number", "frame_size",
+  "instructions_offset", "instructions_count",
+  "upvalues_offset", "upvalues_count",
+  "gc_constants_offset", "gc_constants_count",
+  "nm_constants_offset", "nm_constants_count",
+  "debug_info_offset", "debug_info_size", "first_line", "lines_count",
+)
+
+# Columns of tables of constant tables (values of hash part are stored as key, value pairs)
+TABLE_COLUMNS = ("array_offset", "array_count", "hash_offset", "hash_count")
+
+# Numeric constants types in NUMT section
+NUMBER_INTEGER = 0
+NUMBER_FLOAT = 1
+
+_LITTLE_ENDIAN_HOST = sys.byteorder == "little"
+
+def _column_bytes(typecode: str, values) -> bytes:
+  column = array(typecode, values)
+  if not _LITTLE_ENDIAN_HOST:
+    column.byteswap()
+  return column.tobytes()
+
+def _column(typecode: str, data) -> array:
+  column = array(typecode)
+  column.frombytes(data)
+  if not _LITTLE_ENDIAN_HOST:
+    column.byteswap()
+  return column
+
+# Collects columns of whole bytecode, prototypes are numbered in file order (childs before parents)
+class _BinaryColumns:
+  def __init__(self, bytecode: Bytecode) -> None:
+    self.bytecode = bytecode
+    self.prototypes = list(bytecode.prototypes())
+    self.prototype_indices = { id(prototype): index for index, prototype in enumerate(self.prototypes) }
+
+    self.prototype_columns = [[] for _ in PROTOTYPE_COLUMNS]
+    self.instructions = array("I")
+    self.upvalues = []
+    self.gc_types = bytearray()
+    self.gc_values = []
+    self.complex_values = []
+    self.nm_types = bytearray()
+    self.nm_values = []
+    self.table_columns = [[] for _ in TABLE_COLUMNS]
+    self.table_value_types = bytearray()
+    self.table_values = []
+    self.strings = []
+    self.string_indices = {}
+    self.debug_info = ByteStream(big_endian=bool(bytecode.flags & BytecodeFlag.BigEndian))
+
+    for prototype in self.prototypes:
+      self.add_prototype(prototype)
+
+  def add_string(self, value: bytes) -> int:
+    index = self.string_indices.get(value)
+    if index is None:
+      index = self.string_indices[value] = len(self.strings)
+      self.strings.append(value)
+    return index
+
+  def add_prototype(self, prototype: Prototype):
+    words = prototype.instruction_words()
+    debug_info = prototype.debug_info
+    debug_info_offset = len(self.debug_info.data)
+    if debug_info is not None:
+      debug_info.write(self.debug_info)
+
+    row = (
+      prototype.flags, prototype.parameters_number, prototype.frame_size,
+      len(self.instructions), len(words),
+      len(self.upvalues), len(prototype.upvalues),
+      len(self.gc_types), len(prototype.gc_constants),
+      len(self.nm_types), len(prototype.nm_constants),
+      debug_info_offset, len(self.debug_info.data) - debug_info_offset,
+      debug_info.first_line if debug_info is not None else 0,
+      debug_info.lines_count if debug_info is not None else 0,
+    )
+    for column, value in zip(self.prototype_columns, row):
+      column.append(value)
+
+    self.instructions.extend(words)
+    self.upvalues.extend(prototype.upvalues)
+
+    for gck in prototype.gc_constants:
+      self.gc_types.append(gck.type)
+      self.gc_values.append(self.gc_value(gck))
+
+    for nmk in prototype.nm_constants:
+      if type(nmk) == int:
+        self.nm_types.append(NUMBER_INTEGER)
+        self.nm_values.append(nmk & 0xFFFFFFFFFFFFFFFF)
+      else:
+        self.nm_types.append(NUMBER_FLOAT)
+        self.nm_values.append(interpret_float_as_int(nmk))
+
+  def gc_value(self, gck: GarbageCollectableConstant) -> int:
+    if gck.type == GarbageCollectableConstantType.CHILD:
+      return self.prototype_indices[id(gck.value)]
+    elif gck.type == GarbageCollectableConstantType.TABLE:
+      return self.add_table(gck.value)
+    elif gck.type == GarbageCollectableConstantType.INT64 or gck.type == GarbageCollectableConstantType.UINT64:
+      return gck.value & 0xFFFFFFFFFFFFFFFF
+    elif gck.type == GarbageCollectableConstantType.COMPLEX:
+      self.complex_values.append(gck.value.real)
+      self.complex_values.append(gck.value.imag)
+      return len(self.complex_values) // 2 - 1
+    return self.add_string(gck.value)
+
+  def add_table(self, table: ConstantTable) -> int:
+    row = (len(self.table_value_types), len(table.array), len(self.table_value_types) + len(table.array), len(table.hash))
+    for column, value in zip(self.table_columns, row):
+      column.append(value)
+
+    for value in table.array:
+      self.add_table_value(value)
+    for key, value in table.hash:
+      self.add_table_value(key)
+      self.add_table_value(value)
+
+    return len(self.table_columns[0]) - 1
+
+  def add_table_value(self, value: ConstantTableValue):
+    self.table_value_types.append(value.type)
+    if value.type == ConstantTableValueType.STRING:
+      self.table_values.append(self.add_string(value.value))
+    elif value.type == ConstantTableValueType.INT32 or value.type == ConstantTableValueType.INT64:
+      self.table_values.append(value.value & 0xFFFFFFFFFFFFFFFF)
+    else:
+      self.table_values.append(0)
+
+  def sections(self):
+    bytecode = self.bytecode
+
+    yield b"INFO", _BYTECODE_INFO.pack(bytecode.version, bytecode.flags, len(self.prototypes), 0)
+    yield b"NAME", bytecode.chunk_name
+    yield b"PROT", b"".join(_column_bytes("I", column) for column in self.prototype_columns)
+    yield b"INST", _column_bytes("I", self.instructions)
+    yield b"UPVL", _column_bytes("H", self.upvalues)
+    yield b"GCKT", bytes(self.gc_types)
+    yield b"GCKV", _column_bytes("Q", self.gc_values)
+    yield b"CPLX", _column_bytes("d", self.complex_values)
+    yield b"NUMT", bytes(self.nm_types)
+    yield b"NUMV", _column_bytes("Q", self.nm_values)
+    yield b"TABL", b"".join(_column_bytes("I", column) for column in self.table_columns)
+    yield b"TVAT", bytes(self.table_value_types)
+    yield b"TVAV", _column_bytes("Q", self.table_values)
+
+    offsets = [0]
+    for value in self.strings:
+      offsets.append(offsets[-1] + len(value))
+    yield b"STRO", _column_bytes("I", offsets)
+    yield b"STRD", b"".join(self.strings)
+
+    yield b"DBGI", bytes(self.debug_info.data)
+
+# Write bytecode in binary columnar form to binary sink (callable, that takes bytes. For example, file.write)
+def export_binary(bytecode: Bytecode, write):
+  sections = list(_BinaryColumns(bytecode).sections())
+
+  write(_HEADER.pack(BINARY_MAGIC, BINARY_FORMAT_VERSION, len(sections)))
+  for tag, payload in sections:
+    write(_SECTION_HEADER.pack(tag, 0, len(payload)))
+    write(payload)
+    padding = -len(payload) % 8
+    if padding:
+      write(bytes(padding))
+
+# Returns views to sections of binary export (data is bytes-like object, for example mmap)
+def read_binary_sections(data) -> dict[bytes, memoryview]:
+  data = memoryview(data).cast("B")
+
+  magic, format_version, sections_count = _HEADER.unpack_from(data, 0)
+  if magic != BINARY_MAGIC:
+    raise ValueError(f"Invalid header ({bytes(magic)})")
+  if format_version != BINARY_FORMAT_VERSION:
+    raise ValueError(f"Unsupported format version ({format_version})")
+
+  sections = {}
+  pointer = _HEADER.size
+  for _ in range(sections_count):
+    tag, _, length = _SECTION_HEADER.unpack_from(data, pointer)
+    pointer += _SECTION_HEADER.size
+    if pointer + length > len(data):
+      raise EOFError(f"Unexpected end of data (section {tag} at {pointer})")
+    sections[tag] = data[pointer:pointer + length]
+    pointer += length + (-length % 8)
+
+  return sections
+
+# Load bytecode from binary export. Everything is read from fixed-size columns
+def import_binary(data) -> Bytecode:
+  sections = read_binary_sections(data)
+
+  version, flags, prototypes_count, _ = _BYTECODE_INFO.unpack_from(sections[b"INFO"])
+  big_endian = bool(flags & BytecodeFlag.BigEndian)
+
+  bytecode = Bytecode(version=version, flags=flags)
+  bytecode.chunk_name = sections[b"NAME"].tobytes()
+
+  prototype_columns = _column("I", sections[b"PROT"])
+  prototype_columns = [prototype_columns[i * prototypes_count:(i + 1) * prototypes_count] for i in range(len(PROTOTYPE_COLUMNS))]
+  (flags_column, parameters_column, frame_size_column,
+   instructions_offsets, instructions_counts,
+   upvalues_offsets, upvalues_counts,
+   gc_offsets, gc_counts,
+   nm_offsets, nm_counts,
+   debug_offsets, debug_sizes, first_lines, lines_counts) = prototype_columns
+
+  instructions = sections[b"INST"]
+  upvalues = _column("H", sections[b"UPVL"])
+  gc_types = sections[b"GCKT"]
+  gc_values = _column("Q", sections[b"GCKV"])
+  complex_values = _column("d", sections[b"CPLX"])
+  nm_types = sections[b"NUMT"]
+  nm_values = _column("Q", sections[b"NUMV"])
+  debug_info = sections[b"DBGI"]
+
+  string_offsets = _column("I", sections[b"STRO"])
+  string_data = sections[b"STRD"]
+  strings = [bytecode.string_pool.intern(string_data[string_offsets[i]:string_offsets[i + 1]].tobytes()) for i in range(len(string_offsets) - 1)]
+
+  table_columns = _column("I", sections[b"TABL"])
+  tables_count = len(table_columns) // len(TABLE_COLUMNS)
+  array_offsets, array_counts, hash_offsets, hash_counts = [table_columns[i * tables_count:(i + 1) * tables_count] for i in range(len(TABLE_COLUMNS))]
+  table_value_types = sections[b"TVAT"]
+  table_values = _column("Q", sections[b"TVAV"])
+
+  def table_value(index: int) -> ConstantTableValue:
+    type = table_value_types[index]
+    value = table_values[index]
+    if type == ConstantTableValueType.STRING:
+      value = strings[value]
+    elif type == ConstantTableValueType.INT32:
+      value &= 0xFFFFFFFF
+    elif type != ConstantTableValueType.INT64:
+      value = None
+    return ConstantTableValue(type=type, value=value, string_pool=bytecode.string_pool)
+
+  def table(index: int) -> ConstantTable:
+    result = ConstantTable(string_pool=bytecode.string_pool)
+    offset = array_offsets[index]
+    result.array = [table_value(i) for i in range(offset, offset + array_counts[index])]
+    offset = hash_offsets[index]
+    result.hash = [(table_value(i), table_value(i + 1)) for i in range(offset, offset + hash_counts[index] * 2, 2)]
+    return result
+
+  prototypes = []
+  for index in range(prototypes_count):
+    prototype = Prototype(parent_bytecode=bytecode)
+    prototype.flags = flags_column[index]
+    prototype.parameters_number = parameters_column[index]
+    prototype.frame_size = frame_size_column[index]
+
+    offset = instructions_offsets[index] * 4
+    prototype.instructions = InstructionList.from_bytes(instructions[offset:offset + instructions_counts[index] * 4])
+
+    offset = upvalues_offsets[index]
+    prototype.upvalues = upvalues[offset:offset + upvalues_counts[index]].tolist()
+
+    offset = gc_offsets[index]
+    for i in range(offset, offset + gc_counts[index]):
+      type = gc_types[i]
+      value = gc_values[i]
+      if type == GarbageCollectableConstantType.CHILD:
+        value = prototypes[value]
+        value.parent_prototype = prototype
+        prototype.child_prototypes.append(value)
+      elif type == GarbageCollectableConstantType.TABLE:
+        value = table(value)
+      elif type == GarbageCollectableConstantType.INT64:
+        value = normalize_number_sign(value, 8)
+      elif type == GarbageCollectableConstantType.COMPLEX:
+        value = complex(complex_values[value * 2], complex_values[value * 2 + 1])
+      elif type == GarbageCollectableConstantType.STRING:
+        value = strings[value]
+      prototype.gc_constants.append(GarbageCollectableConstant(type=type, value=value, parent_prototype=prototype))
+
+    offset = nm_offsets[index]
+    values = nm_values[offset:offset + nm_counts[index]]
+    float_indices = [i for i in range(len(values)) if nm_types[offset + i] == NUMBER_FLOAT]
+    prototype.nm_constants = [normalize_number_sign(value, 8) for value in values]
+    for i, value in zip(float_indices, interpret_ints_as_floats([values[i] for i in float_indices])):
+      prototype.nm_constants[i] = value
+
+    if debug_sizes[index] != 0:
+      offset = debug_offsets[index]
+      prototype.debug_info = DebugInfo(debug_info[offset:offset + debug_sizes[index]].tobytes(),
+                                       first_lines[index], lines_counts[index],
+                                       instructions_counts[index], upvalues_counts[index], big_endian)
+
+    prototypes.append(prototype)
+
+  if len(prototypes) > 0:
+    bytecode.global_chunk = prototypes[-1]
+  return bytecode
+
+def _export_string(value: bytes) -> dict:
+  try:
+    return { "type": "string", "value": value.decode("utf-8") }
+  except UnicodeDecodeError:
+    return { "type": "string", "hex": value.hex() }
+
+# Floats are exported with their bits (hex string of 64-bit word), so they are exact and NaN or infinity
+# stay valid JSON. "value" is added only for finite numbers
+def _export_float(bits: int) -> dict:
+  result = { "type": "float", "bits": f"{bits:#018x}" }
+  value = interpret_int_as_float(bits)
+  if math.isfinite(value):
+    result["value"] = value
+  return result
+
+def _export_table_value(value: ConstantTableValue) -> dict:
+  if value.type == ConstantTableValueType.STRING:
+    return _export_string(value.value)
+  elif value.type == ConstantTableValueType.INT32:
+    return { "type": "int32", "value": value.value }
+  elif value.type == ConstantTableValueType.INT64:
+    # despite the name, it's raw bits of double
+    return _export_float(value.value)
+  elif value.type == ConstantTableValueType.TRUE:
+    return { "type": "true" }
+  elif value.type == ConstantTableValueType.FALSE:
+    return { "type": "false" }
+  return { "type": "nil" }
+
+def _export_gc_constant(gck: GarbageCollectableConstant, prototype_indices: dict[int, int]) -> dict:
+  if gck.type == GarbageCollectableConstantType.CHILD:
+    return { "type": "child", "prototype": prototype_indices[id(gck.value)] }
+  elif gck.type == GarbageCollectableConstantType.TABLE:
+    return {
+      "type": "table",
+      "array": [_export_table_value(value) for value in gck.value.array],
+      "hash": [[_export_table_value(key), _export_table_value(value)] for key, value in gck.value.hash],
+    }
+  elif gck.type == GarbageCollectableConstantType.INT64:
+    return { "type": "int64", "value": gck.value }
+  elif gck.type == GarbageCollectableConstantType.UINT64:
+    return { "type": "uint64", "value": gck.value }
+  elif gck.type == GarbageCollectableConstantType.COMPLEX:
+    return { "type": "complex", "real": _export_float(interpret_float_as_int(gck.value.real)),
+             "imag": _export_float(interpret_float_as_int(gck.value.imag)) }
+  return _export_string(gck.value)
+
+def _export_nm_constant(nmk) -> dict:
+  if type(nmk) == int:
+    return { "type": "integer", "value": nmk }
+  return _export_float(interpret_float_as_int(nmk))
+
+def _export_debug_info(debug_info: DebugInfo) -> dict:
+  return {
+    "first_line": debug_info.first_line,
+    "lines_count": debug_info.lines_count,
+    "lines": [debug_info.line_of(pc) for pc in range(debug_info.instructions_count)],
+    "upvalue_names": debug_info.upvalue_names,
+    "variables": [[variable.name, variable.start_pc, variable.end_pc] for variable in debug_info.variables],
+  }
+
+# Write bytecode as newline-delimited JSON to text sink: bytecode record first,
+# then one record per prototype in file order (childs before parents, global chunk is the last)
+def export_ndjson(bytecode: Bytecode, write):
+  prototypes = list(bytecode.prototypes())
+  prototype_indices = { id(prototype): index for index, prototype in enumerate(prototypes) }
+  encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+  write(encoder.encode({
+    "record": "bytecode",
+    "version": bytecode.version,
+    "flags": bytecode.flags,
+    "chunk_name": bytecode.chunk_name.decode("utf-8", "replace"),
+    "prototypes": len(prototypes),
+  }) + "\n")
+
+  for index, prototype in enumerate(prototypes):
+    write(encoder.encode({
+      "record": "prototype",
+      "index": index,
+      "flags": prototype.flags,
+      "parameters_number": prototype.parameters_number,
+      "frame_size": prototype.frame_size,
+      "instructions": list(prototype.instruction_words()),
+      "upvalues": prototype.upvalues,
+      "gc_constants": [_export_gc_constant(gck, prototype_indices) for gck in prototype.gc_constants],
+      "nm_constants": [_export_nm_constant(nmk) for nmk in prototype.nm_constants],
+      "debug_info": _export_debug_info(prototype.debug_info) if prototype.debug_info is not None else None,
+    }) + "\n")
@@ -0,0 +1,39 @@
+from .GarbageCollectableConstant import GarbageCollectableConstantType
+from .NumericConstantsHelper import NumericConstantsHelper
+from .SerializeOptions import SerializeOptions
+
+class Prototype: pass
+
+def serialize_upvalue(upvalue: int) -> str:
+  result = ""
+  if upvalue & 0x8000:
+    result += "local "
+  if upvalue & 0x4000:
+    result += "readonly "
+  return result + str(upvalue & 0x3FFF)
+
+# Pre-rendered constants of prototype, used to show values of constant operands in listing
+class ConstantAnnotations:
+  gc_constants: list[str]
+  nm_constants: list[str]
+  upvalues: list[str]
+
+  def __init__(self, prototype: Prototype = None, options: SerializeOptions = None) -> None:
+    self.gc_constants = []
+    self.nm_constants = []
+    self.upvalues = []
+
+    if prototype is not None:
+      for gck in prototype.gc_constants:
+        if gck.type == GarbageCollectableConstantType.CHILD:
+          self.gc_constants.append("function")
+        elif gck.type == GarbageCollectableConstantType.TABLE:
+          self.gc_constants.append("{...}")
+        else:
+          self.gc_constants.append(gck.serialize(options))
+      self.nm_constants = [NumericConstantsHelper.serialize(nmk) for nmk in prototype.nm_constants]
+      self.upvalues = [serialize_upvalue(upvalue) for upvalue in prototype.upvalues]
+
+# Value from table of annotations (or "?" if index is invalid)
+def resolve_annotation(table: list[str], index: int) -> str:
+  return table[index] if index < len(table) else "?"
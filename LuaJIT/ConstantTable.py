@@ -1,15 +1,19 @@
-from .Types import BytesWritable, BytesInitializable, Serializable
+from .SerializeOptions import SerializeOptions
+from .Types import BytesWritable, BytesInitializable, StreamSerializable
 
 from .ByteStream import ByteStream
 from .ConstantTableValue import ConstantTableValue
+from .StringPool import StringPool
 
-class ConstantTable(BytesWritable, BytesInitializable, Serializable):
+class ConstantTable(BytesWritable, BytesInitializable, StreamSerializable):
   array: list[ConstantTableValue]
   hash: list[tuple[ConstantTableValue, ConstantTableValue]]
+  string_pool: StringPool | None # pool for strings of read values
 
   def __init__(self, data: ByteStream = None,
                array: list[ConstantTableValue] = None, # = []
-               hash: list[tuple[ConstantTableValue, ConstantTableValue]] = None # = []
+               hash: list[tuple[ConstantTableValue, ConstantTableValue]] = None, # = []
+               string_pool: StringPool = None
   ) -> None:
     if array is None:
       array = []
@@ -18,6 +22,7 @@ class ConstantTable(BytesWritable, BytesInitializable, Serializable):
 
     self.array = array
     self.hash = hash
+    self.string_pool = string_pool
 
     if data is not None:
       BytesInitializable.__init__(self, data)
@@ -38,40 +43,46 @@ class ConstantTable(BytesWritable, BytesInitializable, Serializable):
     hash_count = input.read_uleb128()
 
     for _ in range(array_count):
-      value = ConstantTableValue()
+      value = ConstantTableValue(string_pool=self.string_pool)
       value.read(input)
       self.array.append(value)
     
     for _ in range(hash_count):
-      key = ConstantTableValue()
+      key = ConstantTableValue(string_pool=self.string_pool)
       key.read(input)
-      value = ConstantTableValue()
+      value = ConstantTableValue(string_pool=self.string_pool)
       value.read(input)
       self.hash.append((key, value))
 
-  def serialize(self) -> str:
-    result = ""
+  # Skip table in bytestream without decoding it
+  @staticmethod
+  def skip(input: ByteStream):
+    array_count = input.read_uleb128()
+    hash_count = input.read_uleb128()
 
+    for _ in range(array_count + hash_count * 2):
+      ConstantTableValue.skip(input)
+
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
     if len(self.array) == 0 and len(self.hash) == 0:
-      result += "{}"
-      return result
+      write("{}")
+      return
     
-    result += "{\n"
+    new_line = "\n" + indent
+    write("{" + new_line)
 
     index = 0
     for value in self.array:
-      result += f"  [{index}] = "
+      write(f"  [{index}] = ")
       index += 1
-      result += value.serialize()
-      result += "\n"
+      value.serialize_to(write, indent, options)
+      write(new_line)
 
     for key, value in self.hash:
-      result += "  ["
-      result += key.serialize()
-      result += "] = "
-      result += value.serialize()
-      result += "\n"
-
-    result += "}"
+      write("  [")
+      key.serialize_to(write, indent, options)
+      write("] = ")
+      value.serialize_to(write, indent, options)
+      write(new_line)
 
-    return result
\ No newline at end of file
+    write("}")
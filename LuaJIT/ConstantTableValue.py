@@ -1,8 +1,10 @@
-from .Types import BytesWritable, BytesInitializable, Serializable
+from .Types import BytesWritable, BytesInitializable, StreamSerializable
 from .Enum import Enum
-from .Utils import transform_bytes_to_user_string
+from .Utils import transform_bytes_to_user_string, DEFAULT_STRING_ENCODINGS
 
 from .ByteStream import ByteStream
+from .StringPool import StringPool
+from .SerializeOptions import SerializeOptions
 
 class ConstantTableValueType(Enum):
   NIL = 0
@@ -12,19 +14,22 @@ class ConstantTableValueType(Enum):
   INT64 = 4
   STRING = 5
 
-class ConstantTableValue(BytesWritable, BytesInitializable, Serializable):
+class ConstantTableValue(BytesWritable, BytesInitializable, StreamSerializable):
   type: ConstantTableValueType
   value: None | int | bytes
+  string_pool: StringPool | None
 
   def __init__(self, data: ByteStream = None,
                type: ConstantTableValueType = None, # = ConstantTableValueType.NIL
-               value: None | int | bytes = None
+               value: None | int | bytes = None,
+               string_pool: StringPool = None
   ) -> None:
     if type is None:
       type = ConstantTableValueType.NIL
 
     self.type = type
     self.value = value
+    self.string_pool = string_pool
 
     if data is not None:
       BytesInitializable.__init__(self, data)
@@ -56,23 +61,38 @@ class ConstantTableValue(BytesWritable, BytesInitializable, Serializable):
       string_length = self.type - ConstantTableValueType.STRING
       self.type = ConstantTableValueType.STRING
       self.value = input.read_bytes(string_length)
+      if self.string_pool is not None:
+        self.value = self.string_pool.intern(self.value)
     else:
       self.value = None
 
-  def serialize(self) -> str:
-    result = ""
+  # Skip value in bytestream without decoding it
+  @staticmethod
+  def skip(input: ByteStream):
+    type = input.read_uleb128()
 
+    if type == ConstantTableValueType.INT32:
+      input.read_uleb128()
+    elif type == ConstantTableValueType.INT64:
+      input.read_uleb128()
+      input.read_uleb128()
+    elif type >= ConstantTableValueType.STRING:
+      input.pointer += type - ConstantTableValueType.STRING
+
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
     if self.type == ConstantTableValueType.INT32:
-      result += str(self.value)
+      write(str(self.value))
     elif self.type == ConstantTableValueType.INT64:
-      result += str(self.value)
+      write(str(self.value))
     elif self.type == ConstantTableValueType.NIL:
-      result += "nil"
+      write("nil")
     elif self.type == ConstantTableValueType.FALSE:
-      result += "false"
+      write("false")
     elif self.type == ConstantTableValueType.TRUE:
-      result += "true"
+      write("true")
     elif self.type >= ConstantTableValueType.STRING:
-      result += f"\"{transform_bytes_to_user_string(self.value)}\""
-
-    return result
\ No newline at end of file
+      encodings = options.encodings if options is not None else DEFAULT_STRING_ENCODINGS
+      if self.string_pool is not None:
+        write(f"\"{self.string_pool.to_user_string(self.value, encodings)}\"")
+      else:
+        write(f"\"{transform_bytes_to_user_string(self.value, encodings)}\"")
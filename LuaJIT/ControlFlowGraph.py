@@ -0,0 +1,144 @@
+from array import array
+from bisect import bisect_right
+
+from .Opcodes import OPCODES_INFO, OPCODES_MAP
+
+class Prototype: pass
+
+# Kinds of control flow of opcodes
+FLOW_NEXT         = 0 # continues to next instruction
+FLOW_JUMP         = 1 # always jumps to target
+FLOW_BRANCH       = 2 # jumps to target or continues to next instruction (loops)
+FLOW_CONDITIONAL  = 3 # executes next instruction (jump) or skips it (comparisons)
+FLOW_STOP         = 4 # leaves function (returns and tail calls)
+
+_FLOW_OPCODES = {
+  FLOW_JUMP: ("JMP", "UCLO", "ISNEXT"),
+  FLOW_BRANCH: ("FORI", "JFORI", "FORL", "IFORL", "ITERL", "IITERL"),
+  FLOW_CONDITIONAL: ("ISLT", "ISGE", "ISLE", "ISGT", "ISEQV", "ISNEV", "ISEQS", "ISNES",
+                     "ISEQN", "ISNEN", "ISEQP", "ISNEP", "ISTC", "ISFC", "IST", "ISF"),
+  FLOW_STOP: ("RETM", "RET", "RET0", "RET1", "CALLMT", "CALLT"),
+}
+
+# Indexed by opcode value
+OPCODES_FLOW = bytearray(256)
+for flow, names in _FLOW_OPCODES.items():
+  for name in names:
+    OPCODES_FLOW[OPCODES_MAP[name].value] = flow
+
+# Opcodes with jump argument (d), indexed by opcode value.
+# Note, that LOOP and ILOOP have jump argument, but don't change control flow
+JUMP_OPCODES = bytearray(256)
+for info in OPCODES_INFO:
+  if "jump" in info.arguments.values():
+    JUMP_OPCODES[info.value] = 1
+
+# Index of instruction, that jump instruction at pc jumps to
+def jump_target(pc: int, word: int) -> int:
+  return pc + (word >> 16) - 32767
+
+# Set of instructions, that are targets of jumps (bitmap, one byte per instruction)
+def compute_jump_targets(words) -> bytearray:
+  count = len(words)
+  targets = bytearray(count + 1)
+  jump_opcodes = JUMP_OPCODES
+  for pc, word in enumerate(words):
+    if jump_opcodes[word & 0xff]:
+      target = pc + (word >> 16) - 32767
+      if 0 <= target <= count:
+        targets[target] = 1
+  return targets
+
+# Basic blocks and edges between them, stored in flat arrays.
+# Block i contains instructions from block_starts[i] to block_starts[i + 1] (exclusive),
+# its successors are edge_targets[edge_offsets[i]:edge_offsets[i + 1]]
+class ControlFlowGraph:
+  instructions_count: int
+  block_starts: array # array('I'), with instructions_count at the end
+  edge_offsets: array # array('I'), len = blocks count + 1
+  edge_targets: array # array('I'), indices of blocks
+
+  def __init__(self, words = None) -> None:
+    self.instructions_count = 0
+    self.block_starts = array("I", [0])
+    self.edge_offsets = array("I", [0])
+    self.edge_targets = array("I")
+
+    if words is not None:
+      self._build(words)
+
+  @classmethod
+  def from_prototype(cls, prototype: Prototype):
+    return cls(prototype.instruction_words())
+
+  def _build(self, words):
+    count = len(words)
+    flows = OPCODES_FLOW
+
+    # find leaders
+    leaders = bytearray(count + 2)
+    leaders[0] = 1
+    for pc, word in enumerate(words):
+      flow = flows[word & 0xff]
+      if flow == FLOW_NEXT:
+        continue
+      leaders[pc + 1] = 1
+      if flow == FLOW_CONDITIONAL:
+        leaders[pc + 2] = 1
+      elif flow != FLOW_STOP:
+        target = pc + (word >> 16) - 32767
+        if 0 <= target < count:
+          leaders[target] = 1
+
+    block_starts = array("I", (pc for pc in range(count) if leaders[pc]))
+    block_starts.append(count)
+
+    # find edges from last instruction of every block
+    edge_offsets = array("I", [0])
+    edge_targets = array("I")
+    blocks_count = len(block_starts) - 1
+    for block in range(blocks_count):
+      end = block_starts[block + 1]
+      pc = end - 1
+      word = words[pc]
+      flow = flows[word & 0xff]
+
+      if flow == FLOW_NEXT or flow == FLOW_BRANCH or flow == FLOW_CONDITIONAL:
+        if end < count:
+          edge_targets.append(block + 1)
+      if flow == FLOW_CONDITIONAL:
+        if pc + 2 < count:
+          edge_targets.append(bisect_right(block_starts, pc + 2, 0, blocks_count) - 1)
+      elif flow == FLOW_JUMP or flow == FLOW_BRANCH:
+        target = pc + (word >> 16) - 32767
+        if 0 <= target < count:
+          edge_targets.append(bisect_right(block_starts, target, 0, blocks_count) - 1)
+
+      edge_offsets.append(len(edge_targets))
+
+    self.instructions_count = count
+    self.block_starts = block_starts
+    self.edge_offsets = edge_offsets
+    self.edge_targets = edge_targets
+
+  def __len__(self) -> int:
+    return len(self.block_starts) - 1
+
+  # Index of block, that contains instruction
+  def block_of(self, pc: int) -> int:
+    if not 0 <= pc < self.instructions_count:
+      raise IndexError(f"Instruction index out of range ({pc})")
+    return bisect_right(self.block_starts, pc, 0, len(self)) - 1
+
+  # Range of instructions in block
+  def block_range(self, block: int) -> range:
+    return range(self.block_starts[block], self.block_starts[block + 1])
+
+  def successors(self, block: int) -> array:
+    return self.edge_targets[self.edge_offsets[block]:self.edge_offsets[block + 1]]
+
+  # All edges as (source block, target block)
+  def edges(self):
+    for block in range(len(self)):
+      for target in self.successors(block):
+        yield block, target
@@ -0,0 +1,345 @@
+import time
+import traceback
+
+import numpy
+
+from .Opcodes import OPCODES_INFO
+from .Bytecode import Bytecode, BytecodeFlag
+from .ByteStreamReader import ByteStreamReader
+from .Prototype import Prototype
+from .ConstantTableValue import ConstantTableValue
+from .GarbageCollectableConstant import GarbageCollectableConstantType
+
+# Deeper prototypes are counted in the last bucket
+MAX_DEPTH = 64
+
+# Sizes are counted in buckets by bit length: 0, 1, 2-3, 4-7, 8-15...
+SIZE_BUCKETS = 33
+
+GC_CONSTANTS_TYPES = ("child", "table", "int64", "uint64", "complex", "string")
+
+def _size_buckets(sizes: list[int]) -> numpy.ndarray:
+  sizes = numpy.asarray(sizes, dtype=numpy.uint64)
+  buckets = numpy.zeros(len(sizes), dtype=numpy.intp)
+  nonzero = sizes > 0
+  buckets[nonzero] = numpy.floor(numpy.log2(sizes[nonzero].astype(numpy.float64))).astype(numpy.intp) + 1
+  return numpy.bincount(numpy.minimum(buckets, SIZE_BUCKETS - 1), minlength=SIZE_BUCKETS)
+
+def _bucket_name(bucket: int) -> str:
+  if bucket < 2:
+    return str(bucket)
+  return f"{1 << (bucket - 1)}-{(1 << bucket) - 1}"
+
+# Collect types of constants, lengths of strings and sizes of tables without decoding constants.
+# Returns number of childs
+def _scan_constants(input: ByteStreamReader, gc_constants_count: int, nm_constants_count: int,
+                    gc_types: list[int], string_lengths: list[int], table_sizes: list[int], numbers: list[int]) -> int:
+  childs_count = 0
+  for _ in range(gc_constants_count):
+    type = input.read_uleb128()
+    if type >= GarbageCollectableConstantType.STRING:
+      string_lengths.append(type - GarbageCollectableConstantType.STRING)
+      input.pointer += type - GarbageCollectableConstantType.STRING
+      type = GarbageCollectableConstantType.STRING
+    elif type == GarbageCollectableConstantType.TABLE:
+      entries_count = input.read_uleb128() # array part
+      hash_count = input.read_uleb128()
+      table_sizes.append(entries_count + hash_count)
+      for _ in range(entries_count + hash_count * 2):
+        ConstantTableValue.skip(input)
+    elif type == GarbageCollectableConstantType.INT64 or type == GarbageCollectableConstantType.UINT64:
+      input.read_uleb128()
+      input.read_uleb128()
+    elif type == GarbageCollectableConstantType.COMPLEX:
+      for _ in range(4):
+        input.read_uleb128()
+    elif type == GarbageCollectableConstantType.CHILD:
+      childs_count += 1
+    gc_types.append(type)
+
+  for _ in range(nm_constants_count):
+    _, is_float = input.read_uleb128_33()
+    if is_float:
+      input.read_uleb128()
+    numbers[is_float] += 1
+
+  return childs_count
+
+# Same as _scan_constants, but for decoded prototype
+def _count_constants(prototype, gc_types: list[int], string_lengths: list[int], table_sizes: list[int], numbers: list[int]):
+  for gck in prototype.gc_constants:
+    gc_types.append(gck.type)
+    if gck.type == GarbageCollectableConstantType.STRING:
+      string_lengths.append(len(gck.value))
+    elif gck.type == GarbageCollectableConstantType.TABLE:
+      table_sizes.append(len(gck.value.array) + len(gck.value.hash))
+
+  for nmk in prototype.nm_constants:
+    numbers[type(nmk) != int] += 1
+
+# Statistics of opcodes and constants of many compiled files.
+# All counters are fixed-size arrays (opcode counts are indexed by opcode value), so statistics of files are simply added
+class CorpusStatistics:
+  files: int
+  failed: int
+  size: int # total size of files
+  prototypes: int
+  instructions: int
+  prototypes_size: int # bytes of prototypes (without length prefixes)
+  instructions_size: int
+  upvalues_size: int
+  elapsed: float # in seconds
+
+  opcodes: numpy.ndarray # [opcode] = number of instructions
+  frame_sizes: numpy.ndarray # [frame size] = number of prototypes
+  parameters: numpy.ndarray # [number of parameters] = number of prototypes
+  depths: numpy.ndarray # [nesting depth] = number of prototypes (global chunk has depth 0)
+  gc_constants: numpy.ndarray # [GarbageCollectableConstantType] = number of constants
+  nm_constants: numpy.ndarray # [0] = integers, [1] = floats
+  table_sizes: numpy.ndarray # [bucket of number of entries] = number of tables
+  string_lengths: numpy.ndarray # [bucket of length] = number of strings
+
+  def __init__(self) -> None:
+    self.files = 0
+    self.failed = 0
+    self.size = 0
+    self.prototypes = 0
+    self.instructions = 0
+    self.prototypes_size = 0
+    self.instructions_size = 0
+    self.upvalues_size = 0
+    self.elapsed = 0.0
+
+    self.opcodes = numpy.zeros(256, dtype=numpy.int64)
+    self.frame_sizes = numpy.zeros(256, dtype=numpy.int64)
+    self.parameters = numpy.zeros(256, dtype=numpy.int64)
+    self.depths = numpy.zeros(MAX_DEPTH, dtype=numpy.int64)
+    self.gc_constants = numpy.zeros(len(GC_CONSTANTS_TYPES), dtype=numpy.int64)
+    self.nm_constants = numpy.zeros(2, dtype=numpy.int64)
+    self.table_sizes = numpy.zeros(SIZE_BUCKETS, dtype=numpy.int64)
+    self.string_lengths = numpy.zeros(SIZE_BUCKETS, dtype=numpy.int64)
+
+  # Statistics of compiled file (bytes-like object). Nothing is decoded: opcodes are taken as strided column
+  # of instruction blocks, constants are only scanned
+  def add_data(self, data):
+    self.add_stream(ByteStreamReader(data))
+
+  def add_stream(self, input: ByteStreamReader):
+    try:
+      self._add_stream(input)
+    except Exception as e:
+      # traceback keeps frames with views of data, so input couldn't be closed
+      traceback.clear_frames(e.__traceback__)
+      raise
+
+  def _add_stream(self, input: ByteStreamReader):
+    data_bytes = numpy.frombuffer(input.data, dtype=numpy.uint8)
+    bytecode = Bytecode()
+    bytecode.read_header(input)
+    # opcode is the lowest byte of word
+    opcode_offset = 3 if bytecode.flags & BytecodeFlag.BigEndian else 0
+
+    frame_sizes = []
+    parameters = []
+    opcodes = []
+    gc_types = []
+    table_sizes = []
+    string_lengths = []
+    numbers = [0, 0] # integers, floats
+    prototypes_size = 0
+    upvalues_size = 0
+    # depths of prototypes in subtrees, that have no parent yet (childs go before their parents)
+    subtrees = []
+
+    # header of every prototype is read into same object
+    prototype = Prototype(parent_bytecode=bytecode)
+    while True:
+      length_of_prototype = input.read_uleb128()
+      if length_of_prototype == 0:
+        break
+      start = input.pointer
+
+      upvalues_count, gc_constants_count, nm_constants_count, instructions_count, _, _, _ = prototype._read_header(input)
+      frame_sizes.append(prototype.frame_size)
+      parameters.append(prototype.parameters_number)
+      opcodes.append(data_bytes[input.pointer + opcode_offset:input.pointer + instructions_count * 4:4])
+
+      input.pointer += instructions_count * 4 + upvalues_count * 2
+      childs_count = _scan_constants(input, gc_constants_count, nm_constants_count, gc_types, string_lengths, table_sizes, numbers)
+      input.pointer = start + length_of_prototype
+
+      prototypes_size += length_of_prototype
+      upvalues_size += upvalues_count * 2
+
+      if childs_count > len(subtrees):
+        raise ValueError("Corrupted bytecode. Prototype has more childs than preceding prototypes")
+      subtree = [0]
+      if childs_count > 0:
+        for child in subtrees[-childs_count:]:
+          subtree.extend(depth + 1 for depth in child)
+        del subtrees[-childs_count:]
+      subtrees.append(subtree)
+
+    if len(subtrees) == 0:
+      raise ValueError("Corrupted bytecode. No global chunk")
+    if len(subtrees) > 1:
+      raise ValueError(f"Corrupted bytecode. {len(subtrees)} prototypes have no parent (must be only global chunk)")
+
+    opcodes = numpy.bincount(numpy.concatenate(opcodes), minlength=256)
+    self._add_prototypes(frame_sizes, parameters, subtrees[0], opcodes, prototypes_size, upvalues_size,
+                         gc_types, table_sizes, string_lengths, numbers)
+
+  # Statistics of bytecode in memory (prototypes are decoded)
+  def add_bytecode(self, bytecode: Bytecode):
+    frame_sizes = []
+    parameters = []
+    depths = []
+    gc_types = []
+    table_sizes = []
+    string_lengths = []
+    numbers = [0, 0]
+    opcodes = []
+    prototypes_size = 0
+    upvalues_size = 0
+
+    stack = [(bytecode.global_chunk, 0)]
+    while stack:
+      prototype, depth = stack.pop()
+      stack.extend((child, depth + 1) for child in prototype.child_prototypes)
+
+      frame_sizes.append(prototype.frame_size)
+      parameters.append(prototype.parameters_number)
+      depths.append(depth)
+      if prototype.source_length is not None:
+        prototypes_size += prototype.source_length
+
+      words = numpy.asarray(prototype.instruction_words(), dtype=numpy.uint32)
+      opcodes.append(words & 0xff)
+      upvalues_size += len(prototype.upvalues) * 2
+      _count_constants(prototype, gc_types, string_lengths, table_sizes, numbers)
+
+    opcodes = numpy.bincount(numpy.concatenate(opcodes), minlength=256)
+    self._add_prototypes(frame_sizes, parameters, depths, opcodes, prototypes_size, upvalues_size,
+                         gc_types, table_sizes, string_lengths, numbers)
+
+  # Everything is added only here, after whole file is read, so failed files aren't counted partially
+  def _add_prototypes(self, frame_sizes: list[int], parameters: list[int], depths: list[int],
+                      opcodes: numpy.ndarray, prototypes_size: int, upvalues_size: int,
+                      gc_types: list[int], table_sizes: list[int], string_lengths: list[int], numbers: list[int]):
+    instructions = int(opcodes.sum())
+    self.prototypes += len(frame_sizes)
+    self.instructions += instructions
+    self.prototypes_size += prototypes_size
+    self.instructions_size += instructions * 4
+    self.upvalues_size += upvalues_size
+    self.opcodes += opcodes
+    self.frame_sizes += numpy.bincount(frame_sizes, minlength=256)
+    self.parameters += numpy.bincount(parameters, minlength=256)
+    self.depths += numpy.bincount(numpy.minimum(depths, MAX_DEPTH - 1), minlength=MAX_DEPTH)
+    self.gc_constants += numpy.bincount(numpy.asarray(gc_types, dtype=numpy.intp), minlength=len(GC_CONSTANTS_TYPES))
+    self.nm_constants += numbers
+    self.table_sizes += _size_buckets(table_sizes)
+    self.string_lengths += _size_buckets(string_lengths)
+
+  def add_file(self, file_name: str):
+    with ByteStreamReader.open(file_name) as file_content:
+      self.add_stream(file_content)
+      self.size += len(file_content.data)
+    self.files += 1
+
+  def merge(self, other):
+    for name in ("files", "failed", "size", "prototypes", "instructions", "prototypes_size", "instructions_size", "upvalues_size",
+                 "opcodes", "frame_sizes", "parameters", "depths", "gc_constants", "nm_constants", "table_sizes", "string_lengths"):
+      setattr(self, name, getattr(self, name) + getattr(other, name))
+
+  def to_dict(self) -> dict:
+    def names(counts: numpy.ndarray, name) -> dict:
+      return { name(i): int(count) for i, count in enumerate(counts.tolist()) if count != 0 }
+
+    return {
+      "files": self.files,
+      "failed": self.failed,
+      "size": self.size,
+      "prototypes": self.prototypes,
+      "instructions": self.instructions,
+      "prototypes_size": self.prototypes_size,
+      "instructions_size": self.instructions_size,
+      "upvalues_size": self.upvalues_size,
+      "elapsed": self.elapsed,
+      "opcodes": names(self.opcodes, lambda i: OPCODES_INFO[i].name if i < len(OPCODES_INFO) else str(i)),
+      "frame_sizes": names(self.frame_sizes, str),
+      "parameters": names(self.parameters, str),
+      "depths": names(self.depths, str),
+      "gc_constants": names(self.gc_constants, lambda i: GC_CONSTANTS_TYPES[i]),
+      "nm_constants": { "integer": int(self.nm_constants[0]), "float": int(self.nm_constants[1]) },
+      "table_sizes": names(self.table_sizes, _bucket_name),
+      "string_lengths": names(self.string_lengths, _bucket_name),
+    }
+
+  def __str__(self) -> str:
+    def percent(value: int, total: int) -> str:
+      return f"{value * 100 / max(total, 1):.1f}%"
+
+    def distribution(title: str, counts: dict, total: int) -> list[str]:
+      return [title] + [f"  {name:>12} {count:>10} {percent(count, total):>6}" for name, count in counts.items()]
+
+    stats = self.to_dict()
+    elapsed = max(self.elapsed, 1e-9)
+    lines = [
+      f"{self.files} files ({self.failed} failed), {self.size} bytes, {self.prototypes} prototypes, {self.instructions} instructions "
+      f"in {self.elapsed:.2f}s ({self.instructions / elapsed / 1e6:.2f}M instructions/s)",
+      f"prototypes size: {self.prototypes_size} bytes, instructions: {percent(self.instructions_size, self.prototypes_size)}, "
+      f"upvalues: {percent(self.upvalues_size, self.prototypes_size)}, "
+      f"constants and headers: {percent(self.prototypes_size - self.instructions_size - self.upvalues_size, self.prototypes_size)}",
+    ]
+    opcodes = dict(sorted(stats["opcodes"].items(), key=lambda item: -item[1]))
+    lines += distribution("opcodes:", opcodes, self.instructions)
+    lines += distribution("frame sizes:", stats["frame_sizes"], self.prototypes)
+    lines += distribution("parameters:", stats["parameters"], self.prototypes)
+    lines += distribution("nesting depths:", stats["depths"], self.prototypes)
+    gc_total = int(self.gc_constants.sum())
+    lines += distribution("gc constants:", stats["gc_constants"], gc_total)
+    lines += distribution("numeric constants:", stats["nm_constants"], int(self.nm_constants.sum()))
+    lines += distribution("table sizes (entries):", stats["table_sizes"], int(self.table_sizes.sum()))
+    lines += distribution("string lengths:", stats["string_lengths"], int(self.string_lengths.sum()))
+    return "\n".join(lines)
+
+def _statistics_job(file_names: list[str]) -> tuple[CorpusStatistics, list[tuple[str, str]]]:
+  statistics = CorpusStatistics()
+  errors = []
+  for file_name in file_names:
+    try:
+      statistics.add_file(file_name)
+    except Exception as e:
+      statistics.files += 1
+      statistics.failed += 1
+      errors.append((file_name, f"{type(e).__name__}: {e}"))
+  return statistics, errors
+
+# Collect statistics of files in worker processes. Every worker sends back statistics of chunksize files.
+# on_error is called with file name and error for files, that weren't read
+def collect_statistics(file_names: list[str], workers: int = None, chunksize: int = 64, on_error = None) -> CorpusStatistics:
+  statistics = CorpusStatistics()
+  start = time.perf_counter()
+
+  chunks = [file_names[i:i + chunksize] for i in range(0, len(file_names), chunksize)]
+  if workers == 1 or len(chunks) < 2:
+    results = map(_statistics_job, chunks)
+    executor = None
+  else:
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=workers)
+    results = executor.map(_statistics_job, chunks)
+
+  try:
+    for partial_statistics, errors in results:
+      statistics.merge(partial_statistics)
+      if on_error is not None:
+        for file_name, error in errors:
+          on_error(file_name, error)
+  finally:
+    if executor is not None:
+      executor.shutdown()
+
+  statistics.elapsed = time.perf_counter() - start
+  return statistics
@@ -0,0 +1,143 @@
+import sys
+from array import array
+
+from .Types import BytesWritable
+from .ByteStream import ByteStream
+from .ByteStreamReader import ByteStreamReader
+
+# Names of internal variables, stored as single byte in debug info
+VARIABLES_NAMES = (
+  None, # end of variables
+  "(for index)",
+  "(for limit)",
+  "(for step)",
+  "(for generator)",
+  "(for state)",
+  "(for control)",
+)
+
+class DebugVariable:
+  name: str
+  start_pc: int
+  end_pc: int
+
+  __slots__ = ("name", "start_pc", "end_pc")
+
+  def __init__(self, name: str, start_pc: int, end_pc: int) -> None:
+    self.name = name
+    self.start_pc = start_pc
+    self.end_pc = end_pc
+
+  def __repr__(self) -> str:
+    return f"DebugVariable({self.name!r}, {self.start_pc}, {self.end_pc})"
+
+# Debug info of prototype (not stripped bytecode).
+# Kept as raw bytes, that are decoded only on access
+class DebugInfo(BytesWritable):
+  data: bytes
+  first_line: int
+  lines_count: int
+  instructions_count: int
+  upvalues_count: int
+  big_endian: bool # byte order of line info in data
+
+  _line_offsets: array | None
+  _upvalue_names: list[str] | None
+  _variables: list[DebugVariable] | None
+
+  def __init__(self, data: bytes, first_line: int, lines_count: int, instructions_count: int, upvalues_count: int,
+               big_endian: bool = False) -> None:
+    self.data = data
+    self.first_line = first_line
+    self.lines_count = lines_count
+    self.instructions_count = instructions_count
+    self.upvalues_count = upvalues_count
+    self.big_endian = big_endian
+
+    self._line_offsets = None
+    self._upvalue_names = None
+    self._variables = None
+
+  def __len__(self) -> int:
+    return len(self.data)
+
+  # Size of line info entry depends on number of lines
+  @property
+  def line_width(self) -> int:
+    if self.lines_count < 0x100:
+      return 1
+    elif self.lines_count < 0x10000:
+      return 2
+    return 4
+
+  # Line of every instruction, relative to first line
+  @property
+  def line_offsets(self) -> array:
+    if self._line_offsets is None:
+      width = self.line_width
+      line_offsets = array({ 1: "B", 2: "H", 4: "I" }[width])
+      line_offsets.frombytes(self.data[:self.instructions_count * width])
+      if width > 1 and self.big_endian != (sys.byteorder == "big"):
+        line_offsets.byteswap()
+      self._line_offsets = line_offsets
+    return self._line_offsets
+
+  def line_of(self, pc: int) -> int:
+    return self.first_line + self.line_offsets[pc]
+
+  @property
+  def upvalue_names(self) -> list[str]:
+    if self._upvalue_names is None:
+      self._decode_names()
+    return self._upvalue_names
+
+  @property
+  def variables(self) -> list[DebugVariable]:
+    if self._variables is None:
+      self._decode_names()
+    return self._variables
+
+  def _decode_names(self):
+    data = self.data
+    pointer = self.instructions_count * self.line_width
+
+    upvalue_names = []
+    for _ in range(self.upvalues_count):
+      end = data.index(0, pointer)
+      upvalue_names.append(data[pointer:end].decode("utf-8", "replace"))
+      pointer = end + 1
+
+    input = ByteStreamReader(data)
+    input.pointer = pointer
+    variables = []
+    last_pc = 0
+    while True:
+      tag = data[input.pointer]
+      if tag < len(VARIABLES_NAMES):
+        input.pointer += 1
+        if tag == 0:
+          break
+        name = VARIABLES_NAMES[tag]
+      else:
+        end = data.index(0, input.pointer)
+        name = data[input.pointer:end].decode("utf-8", "replace")
+        input.pointer = end + 1
+
+      start_pc = last_pc = last_pc + input.read_uleb128()
+      end_pc = start_pc + input.read_uleb128()
+      variables.append(DebugVariable(name, start_pc, end_pc))
+
+    self._upvalue_names = upvalue_names
+    self._variables = variables
+
+  def write(self, output: ByteStream):
+    if output.big_endian == self.big_endian or self.line_width == 1:
+      output.write_bytes(self.data)
+      return
+
+    line_info_size = self.instructions_count * self.line_width
+    line_offsets = array(self.line_offsets.typecode, self.line_offsets)
+    if output.big_endian != (sys.byteorder == "big"):
+      line_offsets.byteswap()
+    output.write_bytes(line_offsets.tobytes())
+    output.write_bytes(self.data[line_info_size:])
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+# Increase when output of disassembler changes, so old cache entries are not used
+TOOL_VERSION = 6
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+LISTING_EXTENSION = ".luas"
+
+# On-disk cache of disassembled files, keyed by hash of compiled file content.
+# Entries are evicted by least recent use (modification time is updated on every hit)
+class DisassemblyCache:
+  directory: str
+  max_size: int # in bytes
+
+  def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+    self.directory = directory
+    self.max_size = max_size
+
+  # options is string describing disassembler settings, that affect output
+  @staticmethod
+  def key(data, options: str = "") -> str:
+    hash = hashlib.sha256(f"{TOOL_VERSION}:{options}:".encode("utf-8"))
+    hash.update(data)
+    return hash.hexdigest()
+
+  def _path(self, key: str, extension: str) -> str:
+    return os.path.join(self.directory, key[:2], key + extension)
+
+  def _lookup(self, key: str, extension: str) -> str | None:
+    path = self._path(key, extension)
+    try:
+      os.utime(path)
+    except FileNotFoundError:
+      return None
+    return path
+
+  def _store(self, key: str, extension: str, write):
+    path = self._path(key, extension)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # write to temporary file first, so other processes never see partially written entry
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        write(f)
+      os.replace(temporary_path, path)
+    except:
+      os.unlink(temporary_path)
+      raise
+
+  # Copy cached listing to output file. Returns False if there's no such entry
+  def copy_listing(self, key: str, output_file_name: str) -> bool:
+    path = self._lookup(key, LISTING_EXTENSION)
+    if path is None:
+      return False
+    shutil.copyfile(path, output_file_name)
+    return True
+
+  def put_listing_file(self, key: str, listing_file_name: str):
+    with open(listing_file_name, "rb") as listing:
+      self._store(key, LISTING_EXTENSION, lambda f: shutil.copyfileobj(listing, f))
+
+  # Remove least recently used entries until cache fits in max_size
+  def evict(self) -> int:
+    entries = []
+    total_size = 0
+    for root, _, file_names in os.walk(self.directory):
+      for file_name in file_names:
+        # other files are temporary files of entries being written by other processes
+        if not file_name.endswith(LISTING_EXTENSION):
+          continue
+        path = os.path.join(root, file_name)
+        try:
+          stat = os.stat(path)
+        except FileNotFoundError:
+          continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total_size += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+      if total_size <= self.max_size:
+        break
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        pass
+      total_size -= size
+      removed += 1
+
+    return removed
@@ -1,6 +1,7 @@
-from .Types import BytesWritable, BytesInitializable, Serializable
+from .SerializeOptions import SerializeOptions
+from .Types import BytesWritable, BytesInitializable, StreamSerializable
 from .Enum import Enum
-from .Utils import transform_bytes_to_user_string, normalize_number_sign, interpret_int_as_float, interpret_float_as_int, indent_string
+from .Utils import transform_bytes_to_user_string, DEFAULT_STRING_ENCODINGS, normalize_number_sign, interpret_int_as_float, interpret_float_as_int
 
 from .ConstantTable import ConstantTable
 from .ByteStream import ByteStream
@@ -15,7 +16,7 @@ class GarbageCollectableConstantType(Enum):
   COMPLEX = 4
   STRING = 5
 
-class GarbageCollectableConstant(BytesWritable, BytesInitializable, Serializable):
+class GarbageCollectableConstant(BytesWritable, BytesInitializable, StreamSerializable):
   type: GarbageCollectableConstantType
   value: Prototype | ConstantTable | int | complex | bytes
 
@@ -73,14 +74,14 @@ class GarbageCollectableConstant(BytesWritable, BytesInitializable, Serializable
       child_prototype.parent_prototype = self.parent_prototype
       self.parent_prototype.child_prototypes.insert(0, child_prototype)
     elif self.type == GarbageCollectableConstantType.TABLE:
-      table = ConstantTable()
+      table = ConstantTable(string_pool=parent_bytecode.string_pool)
       table.read(input)
       self.value = table
     elif self.type == GarbageCollectableConstantType.INT64 or self.type == GarbageCollectableConstantType.UINT64:
       self.value = input.read_uleb128()
       self.value |= input.read_uleb128() << 32
       if self.type == GarbageCollectableConstantType.INT64:
-        self.value = normalize_number_sign(self.value)
+        self.value = normalize_number_sign(self.value, 8)
     elif self.type == GarbageCollectableConstantType.COMPLEX:
       real = input.read_uleb128()
       real |= input.read_uleb128() << 32
@@ -90,33 +91,50 @@ class GarbageCollectableConstant(BytesWritable, BytesInitializable, Serializable
     elif self.type >= GarbageCollectableConstantType.STRING:
       string_length = self.type - GarbageCollectableConstantType.STRING
       self.type = GarbageCollectableConstantType.STRING
-      self.value = input.read_bytes(string_length)
-
-  def serialize(self) -> str:
-    result = ""
-
+      self.value = parent_bytecode.string_pool.intern(input.read_bytes(string_length))
+
+  # String pool of bytecode this constant belongs to (if known)
+  def _string_pool(self):
+    if self.parent_prototype is None or self.parent_prototype.parent_bytecode is None:
+      return None
+    return self.parent_prototype.parent_bytecode.string_pool
+
+  # Skip constant in bytestream without decoding it. Returns type of constant
+  @staticmethod
+  def skip(input: ByteStream) -> GarbageCollectableConstantType:
+    type = input.read_uleb128()
+
+    if type == GarbageCollectableConstantType.TABLE:
+      ConstantTable.skip(input)
+    elif type == GarbageCollectableConstantType.INT64 or type == GarbageCollectableConstantType.UINT64:
+      input.read_uleb128()
+      input.read_uleb128()
+    elif type == GarbageCollectableConstantType.COMPLEX:
+      for _ in range(4):
+        input.read_uleb128()
+    elif type >= GarbageCollectableConstantType.STRING:
+      input.pointer += type - GarbageCollectableConstantType.STRING
+      type = GarbageCollectableConstantType.STRING
+
+    return type
+
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
     if self.type == GarbageCollectableConstantType.CHILD:
-      child_content = indent_string(self.value.serialize())
+      write(f"{self.value.signature()}\n{indent}  ")
 
-      result += "function("
-      if self.value.flags & 0x02:
-        result += "...)\n  "
-      else:
-        prefix = ""
-        for i in range(self.value.parameters_number):
-          result += f"{prefix}%{i}"
-          prefix = ", "
-        result += ")\n  "
-      
-      result += child_content
-      result += "\n.end"
+      self.value.serialize_to(write, indent + "  ", options)
+
+      write(f"\n{indent}.end")
     elif self.type == GarbageCollectableConstantType.TABLE:
-      result += self.value.serialize()
+      self.value.serialize_to(write, indent, options)
     elif self.type == GarbageCollectableConstantType.INT64 or self.type == GarbageCollectableConstantType.UINT64:
-      result += str(self.value) + ("LL" if self.type == GarbageCollectableConstantType.INT64 else "ULL")
+      write(str(self.value) + ("LL" if self.type == GarbageCollectableConstantType.INT64 else "ULL"))
     elif self.type == GarbageCollectableConstantType.COMPLEX:
-      result += f"{self.value.real} + {self.value.imag}i"
+      write(f"{self.value.real} + {self.value.imag}i")
     elif self.type >= GarbageCollectableConstantType.STRING:
-      result += f"\"{transform_bytes_to_user_string(self.value)}\""
-
-    return result
\ No newline at end of file
+      encodings = options.encodings if options is not None else DEFAULT_STRING_ENCODINGS
+      string_pool = self._string_pool()
+      if string_pool is not None:
+        write(f"\"{string_pool.to_user_string(self.value, encodings)}\"")
+      else:
+        write(f"\"{transform_bytes_to_user_string(self.value, encodings)}\"")
@@ -1,4 +1,6 @@
-from .Opcodes import OpcodeInfo, OPCODES_INFO, UNKNOWN_OPCODE_INFO, TYPES_TO_PREFIXES_MAP, get_opcode_value
+from .Opcodes import OpcodeInfo, OPCODES_INFO, UNKNOWN_OPCODE_INFO, get_opcode_value
+from .InstructionFormatters import OPCODES_FORMATTERS, OPCODES_ANNOTATORS
+from .ConstantAnnotations import ConstantAnnotations
 from .Types import BytesWritable, BytesInitializable, Serializable
 from .Utils import get_instruction_argument
 
@@ -8,6 +10,8 @@ class Instruction(BytesWritable, BytesInitializable, Serializable):
   opcode: int
   arguments: dict[str, int] # [a/b/c/d] = value
 
+  __slots__ = ("opcode", "arguments")
+
   def __init__(self, data: ByteStream = None,
                opcode: int = 0,
                arguments: dict[str, int] = None, # = {}
@@ -37,26 +41,27 @@ class Instruction(BytesWritable, BytesInitializable, Serializable):
   def get_opcode_info(self) -> OpcodeInfo:
     return OPCODES_INFO[self.opcode] if self.opcode < len(OPCODES_INFO) else UNKNOWN_OPCODE_INFO
 
-  def write(self, output: ByteStream):
-    output.write_byte(self.opcode)
+  @classmethod
+  def from_word(cls, value: int):
+    instruction = cls(opcode=value & 0xff)
+    for k in instruction.get_opcode_info().arguments:
+      instruction.arguments[k] = get_instruction_argument(value, k)
+    return instruction
 
-    if 'a' in self.arguments:
-      output.write_byte(self.arguments['a'])
-    else:
-      output.write_byte(0)
+  # Encode instruction to 32-bit word
+  def to_word(self) -> int:
+    arguments = self.arguments
+    value = self.opcode | (arguments.get('a', 0) << 8)
 
-    if 'd' in self.arguments:
-      output.write_word(self.arguments['d'])
+    if 'd' in arguments:
+      value |= arguments['d'] << 16
     else:
-      if 'c' in self.arguments:
-        output.write_byte(self.arguments['c'])
-      else:
-        output.write_byte(0)
+      value |= (arguments.get('c', 0) << 16) | (arguments.get('b', 0) << 24)
 
-      if 'b' in self.arguments:
-        output.write_byte(self.arguments['b'])
-      else:
-        output.write_byte(0)
+    return value
+
+  def write(self, output: ByteStream):
+    output.write_dword(self.to_word())
 
   def read(self, input: ByteStream):
     value = input.read_dword()
@@ -67,30 +72,13 @@ class Instruction(BytesWritable, BytesInitializable, Serializable):
     for k, _ in opcode_info.arguments.items():
       self.arguments[k] = get_instruction_argument(value, k)
 
-  def serialize(self) -> str:
-    opcode_info = self.get_opcode_info()
-    result = opcode_info.name.lower()
-    result += (8 - len(opcode_info.name)) * ' '
-
-    prefix = " "
-    for k, v in opcode_info.arguments.items():
-      if v == "pri":
-        primitive = ""
-        match self.arguments[k]:
-          case 0:
-            primitive = "nil"
-          case 1:
-            primitive = "false"
-          case 2:
-            primitive = "true"
-          case _:
-            primitive = "!nil"
-        result += f"{prefix}{primitive}"
-      elif v == "jump":
-        jump_amount = self.arguments[k] - 32767
-        result += f"{prefix}{'+' if jump_amount > 0 else '-' if jump_amount < 0 else ''}{jump_amount}"
-      else:
-        result += f"{prefix}{TYPES_TO_PREFIXES_MAP[v]}{self.arguments[k]}"
-      prefix = ", "
-
-    return result
\ No newline at end of file
+  # If annotations (ConstantAnnotations of prototype) are specified,
+  # values of constant operands are shown in comment
+  def serialize(self, annotations: ConstantAnnotations = None) -> str:
+    word = self.to_word()
+    result = OPCODES_FORMATTERS[self.opcode](word)
+    if annotations is not None:
+      annotator = OPCODES_ANNOTATORS[self.opcode]
+      if annotator is not None:
+        result += annotator(word, annotations)
+    return result
@@ -0,0 +1,24 @@
+import numpy
+
+# Instructions block decoded at once into columns of instruction fields
+class InstructionColumns:
+  words: numpy.ndarray # uint32
+  opcode: numpy.ndarray # uint8
+  a: numpy.ndarray # uint8
+  b: numpy.ndarray # uint8
+  c: numpy.ndarray # uint8
+  d: numpy.ndarray # uint16
+
+  # words is bytes-like object with little-endian dwords
+  def __init__(self, words) -> None:
+    self.words = numpy.frombuffer(words, dtype="<u4")
+
+    self.opcode = (self.words & 0xff).astype(numpy.uint8)
+    self.a = ((self.words >> 8) & 0xff).astype(numpy.uint8)
+    self.c = ((self.words >> 16) & 0xff).astype(numpy.uint8)
+    self.b = (self.words >> 24).astype(numpy.uint8)
+    self.d = (self.words >> 16).astype(numpy.uint16)
+
+  def __len__(self) -> int:
+    return len(self.words)
+
@@ -0,0 +1,91 @@
+from .Opcodes import OpcodeInfo, OPCODES_INFO, UNKNOWN_OPCODE_INFO, TYPES_TO_PREFIXES_MAP
+from .ConstantAnnotations import resolve_annotation
+
+# Formatter is function, that takes instruction word and returns its text.
+# Formatters for all opcodes are compiled once from OPCODES_INFO, so formatting instruction
+# is a single table lookup and a single f-string evaluation
+
+# Expressions extracting arguments from instruction word
+_ARGUMENTS_EXPRESSIONS = {
+  'a': "((word >> 8) & 0xff)",
+  'b': "(word >> 24)",
+  'c': "((word >> 16) & 0xff)",
+  'd': "(word >> 16)",
+}
+
+MNEMONIC_WIDTH = 8
+
+_PRIMITIVES = ("nil", "false", "true")
+
+def format_primitive(value: int) -> str:
+  return _PRIMITIVES[value] if value < 3 else "!nil"
+
+def format_jump(value: int) -> str:
+  jump_amount = value - 32767
+  return f"{jump_amount:+d}" if jump_amount != 0 else "0"
+
+def _format_operand(argument_name: str, argument_type: str) -> str:
+  expression = _ARGUMENTS_EXPRESSIONS[argument_name]
+  if argument_type == "pri":
+    return f"{{format_primitive({expression})}}"
+  elif argument_type == "jump":
+    return f"{{format_jump({expression})}}"
+  else:
+    return f"{TYPES_TO_PREFIXES_MAP[argument_type]}{{{expression}}}"
+
+def format_mnemonic(opcode_info: OpcodeInfo) -> str:
+  return opcode_info.name.lower() + (MNEMONIC_WIDTH - len(opcode_info.name)) * ' '
+
+# Jumps are shown as labels of target instructions (L<index of instruction>)
+def _format_operand_with_labels(argument_name: str, argument_type: str) -> str:
+  if argument_type == "jump":
+    return f"L{{pc + {_ARGUMENTS_EXPRESSIONS[argument_name]} - 32767}}"
+  return _format_operand(argument_name, argument_type)
+
+# parameters are parameters of formatter function
+def build_formatter(opcode_info: OpcodeInfo, format_operand = _format_operand, parameters: str = "word"):
+  template = format_mnemonic(opcode_info)
+  if len(opcode_info.arguments) > 0:
+    template += " " + ", ".join(format_operand(k, v) for k, v in opcode_info.arguments.items())
+
+  namespace = {
+    "format_primitive": format_primitive,
+    "format_jump": format_jump,
+  }
+  return eval(f"lambda {parameters}: f\"{template}\"", namespace)
+
+def build_formatters(format_operand = _format_operand, parameters: str = "word") -> list:
+  formatters = [build_formatter(info, format_operand, parameters) for info in OPCODES_INFO]
+  unknown = build_formatter(UNKNOWN_OPCODE_INFO, format_operand, parameters)
+  return formatters + [unknown] * (256 - len(formatters))
+
+# Annotator is function, that takes instruction word and ConstantAnnotations of prototype
+# and returns comment with values of constant operands (or None for opcodes without them)
+_ANNOTATIONS_TABLES = {
+  "str": "gc_constants",
+  "tab": "gc_constants",
+  "func": "gc_constants",
+  "cdata": "gc_constants",
+  "num": "nm_constants",
+  "uv": "upvalues",
+}
+
+def build_annotator(opcode_info: OpcodeInfo):
+  values = []
+  for k, v in opcode_info.arguments.items():
+    if v in _ANNOTATIONS_TABLES:
+      values.append(f"{{resolve_annotation(annotations.{_ANNOTATIONS_TABLES[v]}, {_ARGUMENTS_EXPRESSIONS[k]})}}")
+  if len(values) == 0:
+    return None
+
+  namespace = { "resolve_annotation": resolve_annotation }
+  return eval(f"lambda word, annotations: f\" ; {', '.join(values)}\"", namespace)
+
+# Indexed by opcode value
+OPCODES_FORMATTERS = build_formatters()
+
+# Same, but formatters take (word, index of instruction) and show jumps as labels
+OPCODES_LABEL_FORMATTERS = build_formatters(_format_operand_with_labels, "word, pc")
+
+OPCODES_ANNOTATORS = [build_annotator(info) for info in OPCODES_INFO]
+OPCODES_ANNOTATORS += [None] * (256 - len(OPCODES_ANNOTATORS))
@@ -0,0 +1,160 @@
+import sys
+from array import array
+from collections.abc import MutableMapping, MutableSequence
+
+from .Instruction import Instruction
+
+from .ByteStream import ByteStream
+
+assert array("I").itemsize == 4, "array('I') must hold 32-bit words"
+
+# (shift, mask) of instruction arguments in 32-bit word
+_ARGUMENTS_FIELDS = { 'a': (8, 0xff), 'b': (24, 0xff), 'c': (16, 0xff), 'd': (16, 0xffff) }
+
+# Arguments of InstructionReference, read from and written to the word in list
+class _ArgumentsReference(MutableMapping):
+  __slots__ = ("_instruction",)
+
+  def __init__(self, instruction) -> None:
+    self._instruction = instruction
+
+  def __getitem__(self, name: str) -> int:
+    if name not in self._instruction.get_opcode_info().arguments:
+      raise KeyError(name)
+    shift, mask = _ARGUMENTS_FIELDS[name]
+    return (self._instruction.to_word() >> shift) & mask
+
+  def __setitem__(self, name: str, value: int):
+    if name not in _ARGUMENTS_FIELDS:
+      raise KeyError(name)
+    shift, mask = _ARGUMENTS_FIELDS[name]
+    if value < 0 or value > mask:
+      raise ValueError(f"Value {value} of argument {name} is out of range")
+    word = self._instruction.to_word()
+    self._instruction._set_word((word & ~(mask << shift)) | (value << shift))
+
+  def __delitem__(self, name: str):
+    self[name] = 0
+
+  def __iter__(self):
+    return iter(self._instruction.get_opcode_info().arguments)
+
+  def __len__(self) -> int:
+    return len(self._instruction.get_opcode_info().arguments)
+
+  def __repr__(self) -> str:
+    return repr(dict(self))
+
+# Instruction at position of InstructionList. Changes of opcode and arguments are written to the list
+# (reference keeps position, so it points to other instruction after inserting or deleting before it)
+class InstructionReference(Instruction):
+  __slots__ = ("_list", "_index")
+
+  def __init__(self, instructions, index: int) -> None:
+    self._list = instructions
+    self._index = index
+
+  @property
+  def opcode(self) -> int:
+    return self._list.words[self._index] & 0xff
+
+  @opcode.setter
+  def opcode(self, value: int):
+    self._set_word((self.to_word() & ~0xff) | value)
+
+  @property
+  def arguments(self) -> _ArgumentsReference:
+    return _ArgumentsReference(self)
+
+  @arguments.setter
+  def arguments(self, value: dict[str, int]):
+    self._set_word(Instruction(opcode=self.opcode, arguments=dict(value)).to_word())
+
+  def to_word(self) -> int:
+    return self._list.words[self._index]
+
+  def _set_word(self, word: int):
+    self._list.words[self._index] = word
+    self._list._columns = None
+
+  # Copy, that isn't bound to the list
+  def copy(self) -> Instruction:
+    return Instruction.from_word(self.to_word())
+
+  def __reduce__(self):
+    return Instruction.from_word, (self.to_word(),)
+
+# Compact storage of prototype instructions: one packed array of raw 32-bit words.
+# Items are InstructionReference objects, so changes to them are written to the array
+class InstructionList(MutableSequence):
+  words: array # array('I')
+
+  __slots__ = ("words", "_columns")
+
+  def __init__(self, instructions = None) -> None:
+    self.words = array("I")
+    self._columns = None
+
+    if instructions is not None:
+      self.words.extend(instruction.to_word() for instruction in instructions)
+
+  # data is bytes-like object with dwords in specified byte order.
+  # Byte order is fixed for whole block, so it's swapped at once
+  @classmethod
+  def from_bytes(cls, data, big_endian: bool = False):
+    instructions = cls()
+    instructions.words.frombytes(data)
+    if big_endian != (sys.byteorder == "big"):
+      instructions.words.byteswap()
+    return instructions
+
+  # Columns of decoded fields (see InstructionColumns)
+  @property
+  def columns(self):
+    if self._columns is None:
+      from .InstructionColumns import InstructionColumns
+      self._columns = InstructionColumns(self.to_bytes())
+    return self._columns
+
+  def to_bytes(self, big_endian: bool = False) -> bytes:
+    if big_endian != (sys.byteorder == "big"):
+      words = array("I", self.words)
+      words.byteswap()
+      return words.tobytes()
+    return self.words.tobytes()
+
+  def write(self, output: ByteStream):
+    output.write_bytes(self.to_bytes(output.big_endian))
+
+  def __len__(self) -> int:
+    return len(self.words)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      instructions = InstructionList()
+      instructions.words = self.words[index]
+      return instructions
+    if index < 0:
+      index += len(self.words)
+    if index < 0 or index >= len(self.words):
+      raise IndexError("instruction index out of range")
+    return InstructionReference(self, index)
+
+  def __setitem__(self, index, value):
+    if isinstance(index, slice):
+      self.words[index] = array("I", (instruction.to_word() for instruction in value))
+    else:
+      self.words[index] = value.to_word()
+    self._columns = None
+
+  def __delitem__(self, index):
+    del self.words[index]
+    self._columns = None
+
+  def insert(self, index: int, value: Instruction):
+    self.words.insert(index, value.to_word())
+    self._columns = None
+
+  def __iter__(self):
+    for index in range(len(self.words)):
+      yield InstructionReference(self, index)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from .Bytecode import Bytecode
+from .DisassemblyCache import TOOL_VERSION
+
+MANIFEST_EXTENSION = ".manifest.json"
+
+# Listings of prototypes from previous disassembly of file, used to render only changed prototypes.
+# Prototype is identified by hash of its bytes in file and hashes of its childs (so equal hash means equal listing).
+# Listing of prototype is stored without listings of childs (Prototype.CHILD_PLACEHOLDER is written instead),
+# see Prototype._serialize_from_manifest
+class ListingManifest:
+  options: str # SerializeOptions.key() of listings
+  listings: dict[str, str] # hash of prototype -> listing (with indent "")
+  used_listings: dict[str, str] # listings used in this disassembly (only they are saved)
+  recording: bool # listing of prototype is being rendered, so childs write placeholders
+  reused: int # number of prototypes, which listings were reused
+  rendered: int
+
+  _keys: dict[int, str] # id(prototype) -> hash
+
+  def __init__(self, options: str = "", listings: dict[str, str] = None) -> None:
+    if listings is None:
+      listings = {}
+
+    self.options = options
+    self.listings = listings
+    self.used_listings = {}
+    self.recording = False
+    self.reused = 0
+    self.rendered = 0
+    self._keys = {}
+
+  # Load manifest, saved by save(). Manifest of other version or options is ignored
+  @classmethod
+  def load(cls, file_name: str, options: str = ""):
+    try:
+      with open(file_name, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    except (FileNotFoundError, ValueError):
+      return cls(options)
+
+    if content.get("version") != TOOL_VERSION or content.get("options") != options:
+      return cls(options)
+    return cls(options, content.get("listings", {}))
+
+  def save(self, file_name: str):
+    directory = os.path.dirname(os.path.abspath(file_name))
+    fd, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({ "version": TOOL_VERSION, "options": self.options, "listings": self.used_listings }, f, ensure_ascii=False)
+      os.replace(temporary_path, file_name)
+    except:
+      os.unlink(temporary_path)
+      raise
+
+  # Hash prototypes of bytecode. data is bytes-like object bytecode was read from
+  def add_bytecode(self, bytecode: Bytecode, data):
+    data = memoryview(data)
+    salt = f"{TOOL_VERSION}:{self.options}:{bytecode.version}:{bytecode.flags}:".encode("utf-8")
+
+    # childs go before parents, so their hashes are already known
+    for prototype in bytecode.prototypes():
+      if prototype.source_offset is None:
+        continue
+      hash = hashlib.sha256(salt)
+      hash.update(data[prototype.source_offset:prototype.source_offset + prototype.source_length])
+      for child in prototype.child_prototypes:
+        key = self._keys.get(id(child))
+        if key is None:
+          break
+        hash.update(key.encode("ascii"))
+      else:
+        self._keys[id(prototype)] = hash.hexdigest()
+
+  def key_of(self, prototype) -> str | None:
+    return self._keys.get(id(prototype))
+
+  # Stored listing of prototype (or None if it's changed)
+  def get(self, key: str) -> str | None:
+    listing = self.listings.get(key)
+    if listing is not None:
+      self.reused += 1
+      self.used_listings[key] = listing
+    return listing
+
+  def put(self, key: str, listing: str):
+    self.rendered += 1
+    self.used_listings[key] = listing
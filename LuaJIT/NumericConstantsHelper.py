@@ -1,4 +1,4 @@
-from .Utils import normalize_number_sign, interpret_float_as_int, interpret_int_as_float
+from .Utils import normalize_number_sign, interpret_float_as_int, interpret_int_as_float, interpret_ints_as_floats
 
 from .ByteStream import ByteStream
 from .NumericConstant import NumericConstant
@@ -26,4 +26,25 @@ class NumericConstantsHelper:
       int_value = first | (second << 32)
       return interpret_int_as_float(int_value)
     else:
-      return normalize_number_sign(first, 4)
\ No newline at end of file
+      return normalize_number_sign(first, 4)
+
+  # Read specified number of constants. Floats are decoded all at once
+  @staticmethod
+  def read_all(input: ByteStream, count: int) -> list[NumericConstant]:
+    result = [None] * count
+    float_indices = []
+    float_values = []
+
+    for i in range(count):
+      first, is_float = input.read_uleb128_33()
+      if is_float:
+        second = input.read_uleb128()
+        float_indices.append(i)
+        float_values.append(first | (second << 32))
+      else:
+        result[i] = normalize_number_sign(first, 4)
+
+    for i, value in zip(float_indices, interpret_ints_as_floats(float_values)):
+      result[i] = value
+
+    return result
@@ -0,0 +1,137 @@
+import time
+import tracemalloc
+
+# Opt-in timing of reading/serializing/writing phases.
+# Code measures phase with:
+#   with PROFILER.phase("instructions"):
+#     ...
+# When profiler is disabled, phase() returns shared object doing nothing. Code, that runs for every prototype,
+# checks PROFILER.enabled instead (see Prototype._read_body), and nothing is measured per instruction
+
+class PhaseStatistics:
+  calls: int
+  elapsed: float # in seconds, includes nested phases
+  allocated: int # net change of traced memory in bytes (only if memory is traced)
+
+  def __init__(self) -> None:
+    self.calls = 0
+    self.elapsed = 0.0
+    self.allocated = 0
+
+class _DisabledPhase:
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    return False
+
+_DISABLED_PHASE = _DisabledPhase()
+
+class _Phase:
+  profiler: "Profiler"
+  name: str
+  start: float
+  memory: int
+
+  __slots__ = ("profiler", "name", "start", "memory")
+
+  def __init__(self, profiler, name: str) -> None:
+    self.profiler = profiler
+    self.name = name
+
+  def __enter__(self):
+    self.memory = tracemalloc.get_traced_memory()[0] if self.profiler.trace_memory else 0
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, *args):
+    elapsed = time.perf_counter() - self.start
+    allocated = tracemalloc.get_traced_memory()[0] - self.memory if self.profiler.trace_memory else 0
+    self.profiler.record(self.name, elapsed, allocated)
+    return False
+
+class Profiler:
+  enabled: bool
+  trace_memory: bool
+  phases: dict[str, PhaseStatistics] # in order of first use
+  callbacks: list # called with (phase name, elapsed seconds, allocated bytes) after every phase
+
+  _started_tracemalloc: bool
+
+  def __init__(self) -> None:
+    self.enabled = False
+    self.trace_memory = False
+    self.phases = {}
+    self.callbacks = []
+    self._started_tracemalloc = False
+
+  # tracemalloc slows down all allocations, so memory is traced only if asked
+  def enable(self, trace_memory: bool = True):
+    self.enabled = True
+    self.trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started_tracemalloc = True
+
+  def disable(self):
+    self.enabled = False
+    self.trace_memory = False
+    if self._started_tracemalloc:
+      tracemalloc.stop()
+      self._started_tracemalloc = False
+
+  def reset(self):
+    self.phases = {}
+
+  def add_callback(self, callback):
+    self.callbacks.append(callback)
+
+  def remove_callback(self, callback):
+    self.callbacks.remove(callback)
+
+  def phase(self, name: str):
+    if not self.enabled:
+      return _DISABLED_PHASE
+    return _Phase(self, name)
+
+  # Same as calling function inside of phase. Hot code checks enabled first and calls function directly if it's False
+  def call(self, name: str, function, *args):
+    with self.phase(name):
+      return function(*args)
+
+  def record(self, name: str, elapsed: float, allocated: int = 0):
+    statistics = self.phases.get(name)
+    if statistics is None:
+      statistics = self.phases[name] = PhaseStatistics()
+    statistics.calls += 1
+    statistics.elapsed += elapsed
+    statistics.allocated += allocated
+
+    for callback in self.callbacks:
+      callback(name, elapsed, allocated)
+
+  # Add phases of other profiler (result of to_dict(), for example from worker process).
+  # Callbacks aren't called for them
+  def merge(self, phases: dict):
+    for name, values in phases.items():
+      statistics = self.phases.get(name)
+      if statistics is None:
+        statistics = self.phases[name] = PhaseStatistics()
+      statistics.calls += values["calls"]
+      statistics.elapsed += values["elapsed"]
+      statistics.allocated += values["allocated"]
+
+  def to_dict(self) -> dict:
+    return { name: { "calls": s.calls, "elapsed": s.elapsed, "allocated": s.allocated } for name, s in self.phases.items() }
+
+  def __str__(self) -> str:
+    lines = [f"{'phase':<20} {'calls':>10} {'time, ms':>12} {'per call, us':>14}" + (f" {'allocated, KB':>14}" if self.trace_memory else "")]
+    for name, s in self.phases.items():
+      line = f"{name:<20} {s.calls:>10} {s.elapsed * 1e3:>12.2f} {s.elapsed * 1e6 / max(s.calls, 1):>14.2f}"
+      if self.trace_memory:
+        line += f" {s.allocated / 1024:>14.1f}"
+      lines.append(line)
+    return "\n".join(lines)
+
+# Profiler used by all modules
+PROFILER = Profiler()
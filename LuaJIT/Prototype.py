@@ -1,11 +1,21 @@
-from .Types import BytesWritable, BytesInitializable, Serializable
+from .SerializeOptions import SerializeOptions
+from .Types import BytesWritable, BytesInitializable, StreamSerializable
 from .Enum import Enum
 
 from .Instruction import Instruction
-from .GarbageCollectableConstant import GarbageCollectableConstant
+from .InstructionList import InstructionList
+from .InstructionFormatters import OPCODES_FORMATTERS, OPCODES_LABEL_FORMATTERS, OPCODES_ANNOTATORS
+from .ConstantAnnotations import ConstantAnnotations, serialize_upvalue
+from .ControlFlowGraph import compute_jump_targets
+from .GarbageCollectableConstant import GarbageCollectableConstant, GarbageCollectableConstantType
 from .ByteStream import ByteStream
 from .NumericConstant import NumericConstant
 from .NumericConstantsHelper import NumericConstantsHelper
+from .DebugInfo import DebugInfo
+from .Profiler import PROFILER
+
+# Marks place of child function in listings stored in ListingManifest
+CHILD_PLACEHOLDER = "\0"
 
 class Prototype: pass
 class Bytecode: pass
@@ -17,87 +27,241 @@ class PrototypeFlag(Enum):
   NoJIT       = 0x08
   PatchILOOP  = 0x10
 
-class Prototype(BytesWritable, BytesInitializable, Serializable):
+# Attributes of lazily read prototype, that are decoded on first access
+_LAZY_ATTRIBUTES = ("instructions", "upvalues", "gc_constants", "nm_constants", "debug_info")
+
+class Prototype(BytesWritable, BytesInitializable, StreamSerializable):
   flags: PrototypeFlag
   parameters_number: int
   frame_size: int
-  instructions: list[Instruction]
+  instructions: InstructionList | list[Instruction]
   upvalues: list[int]
   gc_constants: list[GarbageCollectableConstant]
   nm_constants: list[NumericConstant]
+  debug_info: DebugInfo | None # only in not stripped bytecode
   parent_prototype: Prototype
   child_prototypes: list[Prototype]
   parent_bytecode: Bytecode
+  source_offset: int | None # offset of prototype data (after length) in bytestream it was read from
+  source_length: int | None
+
+  _source: ByteStream | None # bytestream of lazily read prototype, that is not decoded yet
+  _source_counts: tuple[int, int, int, int, int, int, int]
 
   def __init__(self, data: ByteStream = None, parent_bytecode: Bytecode = None) -> None:
     self.flags = 0
     self.parameters_number = 0
     self.frame_size = 0
-    self.instructions = []
+    self.instructions = InstructionList()
     self.upvalues = []
     self.gc_constants = []
     self.nm_constants = []
+    self.debug_info = None
     self.parent_prototype = None
     self.child_prototypes = []
     self.parent_bytecode = parent_bytecode
+    self.source_offset = None
+    self.source_length = None
+    self._source = None
     
     if data is not None:
       BytesInitializable.__init__(self, data)
 
+  def __getattr__(self, name: str):
+    # called only if attribute is missing, so decoded prototypes have no overhead
+    if name in _LAZY_ATTRIBUTES and self.__dict__.get("_source") is not None:
+      self.decode()
+      return getattr(self, name)
+    raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+  @property
+  def is_decoded(self) -> bool:
+    return self._source is None
+
+  # Decode instructions, upvalues and constants of lazily read prototype.
+  # Bytestream it was read from must be still available
+  def decode(self):
+    input = self._source
+    if input is None:
+      return
+
+    # childs are already known, so constants take them from this list instead of bytecode stack
+    bytecode = self.parent_bytecode
+    prototypes_stack = bytecode._prototypes_stack
+    child_prototypes = self.child_prototypes
+    bytecode._prototypes_stack = list(child_prototypes)
+    self.child_prototypes = []
+
+    pointer = input.pointer
+    try:
+      input.pointer = self._source_offset
+      self._read_body(input, *self._source_counts)
+    except:
+      self.child_prototypes = child_prototypes
+      raise
+    finally:
+      input.pointer = pointer
+      bytecode._prototypes_stack = prototypes_stack
+
+    self._source = None
+
+  # Raw 32-bit words of instructions
+  def instruction_words(self):
+    if isinstance(self.instructions, InstructionList):
+      return self.instructions.words
+    return [instruction.to_word() for instruction in self.instructions]
+
+  # Instructions decoded into columns (see InstructionColumns).
+  # Requires numpy
+  @property
+  def instruction_columns(self):
+    if not isinstance(self.instructions, InstructionList):
+      self.instructions = InstructionList(self.instructions)
+    return self.instructions.columns
+
   def write(self, output: ByteStream):
     for child in self.child_prototypes:
       child.write(output)
 
-    data = ByteStream()
-    data.write_byte(self.flags)
-    data.write_byte(self.parameters_number)
-    data.write_byte(self.frame_size)
-    data.write_byte(len(self.upvalues))
-    data.write_uleb128(len(self.gc_constants))
-    data.write_uleb128(len(self.nm_constants))
-    data.write_uleb128(len(self.instructions))
+    # Length of prototype is unknown until it's written,
+    # so write it first and then insert length before it
+    start = output.pointer
+
+    output.write_byte(self.flags)
+    output.write_byte(self.parameters_number)
+    output.write_byte(self.frame_size)
+    output.write_byte(len(self.upvalues))
+    output.write_uleb128(len(self.gc_constants))
+    output.write_uleb128(len(self.nm_constants))
+    output.write_uleb128(len(self.instructions))
+
+    if not self._is_stripped():
+      if self.debug_info is None:
+        output.write_uleb128(0)
+      else:
+        output.write_uleb128(len(self.debug_info))
+        output.write_uleb128(self.debug_info.first_line)
+        output.write_uleb128(self.debug_info.lines_count)
     
-    for instruction in self.instructions:
-      instruction.write(data)
+    if isinstance(self.instructions, InstructionList):
+      self.instructions.write(output)
+    else:
+      for instruction in self.instructions:
+        instruction.write(output)
 
     for upvalue in self.upvalues:
-      data.write_word(upvalue)
+      output.write_word(upvalue)
     
-    self.gc_constants.reverse()
-    for gck in self.gc_constants:
-      gck.write(data)
-    self.gc_constants.reverse()
+    for gck in reversed(self.gc_constants):
+      gck.write(output)
 
     for nmk in self.nm_constants:
-      NumericConstantsHelper.write(nmk, data)
+      NumericConstantsHelper.write(nmk, output)
+
+    if not self._is_stripped() and self.debug_info is not None:
+      self.debug_info.write(output)
 
-    output.write_uleb128(len(data.data))
-    output.write_bytes(data.data)
+    length_of_prototype = output.pointer - start
+    output.pointer = start
+    output.write_uleb128(length_of_prototype)
+    output.pointer += length_of_prototype
 
-  def read(self, input: ByteStream) -> bool:
+  # If lazy is True, only header of prototype is read.
+  # Everything else is decoded on first access (see decode())
+  def read(self, input: ByteStream, lazy: bool = False) -> bool:
     assert self.parent_bytecode is not None, "Cannot read Prototype from ByteStream without parent bytecode"
 
     length_of_prototype = input.read_uleb128()
     if length_of_prototype == 0:
       return False
 
+    self.source_offset = input.pointer
+    self.source_length = length_of_prototype
+
+    if PROFILER.enabled:
+      counts = PROFILER.call("prototype header", self._read_header, input)
+    else:
+      counts = self._read_header(input)
+    upvalues_count, gc_constants_count, _, instructions_count, _, _, _ = counts
+
+    if not lazy:
+      self._read_body(input, *counts)
+      return True
+
+    self._source = input
+    self._source_offset = input.pointer
+    self._source_counts = counts
+
+    # constants still have to be scanned to find out number of childs
+    input.pointer += instructions_count * 4 + upvalues_count * 2
+    childs_count = 0
+    for _ in range(gc_constants_count):
+      if GarbageCollectableConstant.skip(input) == GarbageCollectableConstantType.CHILD:
+        childs_count += 1
+
+    for _ in range(childs_count):
+      child_prototype = self.parent_bytecode._prototypes_stack.pop()
+      child_prototype.parent_prototype = self
+      self.child_prototypes.insert(0, child_prototype)
+
+    input.pointer = self.source_offset + length_of_prototype
+    for name in _LAZY_ATTRIBUTES:
+      delattr(self, name)
+
+    return True
+
+  def _read_body(self, input: ByteStream, upvalues_count: int, gc_constants_count: int, nm_constants_count: int, instructions_count: int,
+                 debug_info_size: int, first_line: int, lines_count: int):
+    # profiler is checked once per prototype, so disabled profiler costs nothing
+    if PROFILER.enabled:
+      PROFILER.call("instructions", self._read_instructions, input, instructions_count)
+      PROFILER.call("upvalues", self._read_upvalues, input, upvalues_count)
+      PROFILER.call("gc constants", self._read_gc_constants, input, gc_constants_count)
+      PROFILER.call("numeric constants", self._read_nm_constants, input, nm_constants_count)
+    else:
+      self._read_instructions(input, instructions_count)
+      self._read_upvalues(input, upvalues_count)
+      self._read_gc_constants(input, gc_constants_count)
+      self._read_nm_constants(input, nm_constants_count)
+
+    self.debug_info = None
+    if debug_info_size != 0:
+      # debug info is only sliced here, it's decoded on first access
+      self.debug_info = DebugInfo(input.read_bytes(debug_info_size), first_line, lines_count, instructions_count, upvalues_count,
+                                  input.big_endian)
+
+  # Returns counts of prototype's parts (see _source_counts)
+  def _read_header(self, input: ByteStream) -> tuple[int, int, int, int, int, int, int]:
     self.flags = input.read_byte()
     self.parameters_number = input.read_byte()
     self.frame_size = input.read_byte()
-    
+
     upvalues_count = input.read_byte()
     gc_constants_count = input.read_uleb128()
     nm_constants_count = input.read_uleb128()
     instructions_count = input.read_uleb128()
 
-    for _ in range(instructions_count):
-      instruction = Instruction()
-      instruction.read(input)
-      self.instructions.append(instruction)
+    debug_info_size = 0
+    first_line = 0
+    lines_count = 0
+    if not self._is_stripped():
+      debug_info_size = input.read_uleb128()
+      if debug_info_size != 0:
+        first_line = input.read_uleb128()
+        lines_count = input.read_uleb128()
 
+    return upvalues_count, gc_constants_count, nm_constants_count, instructions_count, debug_info_size, first_line, lines_count
+
+  def _read_instructions(self, input: ByteStream, instructions_count: int):
+    self.instructions = InstructionList.from_bytes(input.read_bytes(instructions_count * 4), input.big_endian)
+
+  def _read_upvalues(self, input: ByteStream, upvalues_count: int):
+    self.upvalues = []
     for _ in range(upvalues_count):
       self.upvalues.append(input.read_word())
 
+  def _read_gc_constants(self, input: ByteStream, gc_constants_count: int):
+    self.gc_constants = []
     for _ in range(gc_constants_count):
       gc_constant = GarbageCollectableConstant()
       gc_constant.parent_prototype = self
@@ -105,62 +269,126 @@ class Prototype(BytesWritable, BytesInitializable, Serializable):
       self.gc_constants.append(gc_constant)
     self.gc_constants.reverse()
 
-    for _ in range(nm_constants_count):
-      value = NumericConstantsHelper.read(input)
-      self.nm_constants.append(value)
+  def _read_nm_constants(self, input: ByteStream, nm_constants_count: int):
+    self.nm_constants = NumericConstantsHelper.read_all(input, nm_constants_count)
 
-    return True
+  # Not stripped bytecode has debug info fields in prototypes
+  def _is_stripped(self) -> bool:
+    # 0x02 is BytecodeFlag.StripDebugInfo
+    return self.parent_bytecode is None or (self.parent_bytecode.flags & 0x02) != 0
+
+  # Parameters of function as they are shown in listing. For example, "function(%0, %1, ...)"
+  def signature(self) -> str:
+    parameters = [f"%{i}" for i in range(self.parameters_number)]
+    if self.flags & PrototypeFlag.VarArg:
+      parameters.append("...")
+    return f"function({', '.join(parameters)})"
+
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
+    if options is not None and options.manifest is not None:
+      self._serialize_from_manifest(write, indent, options)
+    else:
+      self._serialize_to(write, indent, options)
+
+  # Listing of unchanged prototype is taken from manifest, childs are rendered (or taken) separately
+  def _serialize_from_manifest(self, write, indent: str, options: SerializeOptions):
+    manifest = options.manifest
+    if manifest.recording:
+      # listing of parent is being rendered
+      write(CHILD_PLACEHOLDER)
+      return
+
+    key = manifest.key_of(self)
+    if key is None:
+      self._serialize_to(write, indent, options)
+      return
 
-  def serialize(self) -> str:
-    result = ""
+    listing = manifest.get(key)
+    if listing is None:
+      parts = []
+      manifest.recording = True
+      try:
+        self._serialize_to(parts.append, "", options)
+      finally:
+        manifest.recording = False
+      listing = "".join(parts)
+      manifest.put(key, listing)
 
-    have_header = False
+    pieces = listing.split(CHILD_PLACEHOLDER)
+    new_line = "\n" + indent
+    for i, piece in enumerate(pieces):
+      write(piece.replace("\n", new_line) if indent else piece)
+      if i < len(self.child_prototypes):
+        self.child_prototypes[i].serialize_to(write, indent + "  ", options)
+
+  def _serialize_to(self, write, indent: str, options: SerializeOptions):
+    new_line = "\n" + indent
+
+    write(f".framesize {self.frame_size}{new_line}")
 
     if self.flags & PrototypeFlag.NoJIT:
-      result += ".NoJIT\n"
-      have_header = True
+      write(".NoJIT" + new_line)
     if self.flags & PrototypeFlag.PatchILOOP:
-      result += ".PatchILOOP\n"
-      have_header = True
+      write(".PatchILOOP" + new_line)
+    if self.flags & PrototypeFlag.UsesFFi:
+      write(".UsesFFI" + new_line)
 
     index = 0
     for gck in self.gc_constants:
-      have_header = True
-      result += f".const @{index} = "
+      write(f".const @{index} = ")
       index += 1
-      result += gck.serialize()
-      result += "\n"
+      gck.serialize_to(write, indent, options)
+      write(new_line)
     
     index = 0
     for nmk in self.nm_constants:
-      have_header = True
-      result += f".number #{index} = {NumericConstantsHelper.serialize(nmk)}\n"
+      write(f".number #{index} = {NumericConstantsHelper.serialize(nmk)}{new_line}")
       index += 1
 
     index = 0
     for upvalue in self.upvalues:
-      have_header = True
-      result += f".upvalue ^{index} = "
+      write(f".upvalue ^{index} = {serialize_upvalue(upvalue)}{new_line}")
+      index += 1
 
-      real_value = upvalue & 0x3FFF
-      is_local = (upvalue & 0x8000) != 0
-      is_immutable = (upvalue & 0x4000) != 0
+    if len(self.instructions) == 0:
+      return
 
-      if is_local:
-        result += "local "
-      if is_immutable:
-        result += "readonly "
+    write(new_line)
 
-      result += str(real_value) + "\n"
+    words = self.instruction_words()
+    labels = options is not None and options.labels
+    annotate = options is not None and options.annotate
+    if labels or annotate:
+      write(new_line.join(self._format_instructions(words, options)))
+    else:
+      formatters = OPCODES_FORMATTERS
+      write(new_line.join([formatters[word & 0xff](word) for word in words]))
 
-      index += 1
+  def _format_instructions(self, words, options: SerializeOptions) -> list[str]:
+    labels = options.labels
+    annotate = options.annotate
+    if labels:
+      targets = compute_jump_targets(words)
+    else:
+      targets = bytearray(len(words) + 1)
+
+    annotations = None
+    if annotate:
+      annotations = ConstantAnnotations(self, options)
 
-    if have_header:
-      result += "\n"
+    formatters = OPCODES_LABEL_FORMATTERS if labels else OPCODES_FORMATTERS
+    annotators = OPCODES_ANNOTATORS
 
-    for instruction in self.instructions:
-      result += instruction.serialize()
-      result += "\n"
-    result = result[:-1]
+    lines = []
+    for pc, word in enumerate(words):
+      if targets[pc]:
+        lines.append(f"L{pc}:")
+      opcode = word & 0xff
+      line = formatters[opcode](word, pc) if labels else formatters[opcode](word)
+      if annotate and annotators[opcode] is not None:
+        line += annotators[opcode](word, annotations)
+      lines.append(line)
+    if targets[len(words)]:
+      lines.append(f"L{len(words)}:")
 
-    return result
\ No newline at end of file
+    return lines
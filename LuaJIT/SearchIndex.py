@@ -0,0 +1,258 @@
+import hashlib
+import os
+import sqlite3
+from collections import Counter
+
+from .Opcodes import OPCODES_MAP
+from .Bytecode import Bytecode
+from .ByteStreamReader import ByteStreamReader
+from .InstructionList import InstructionList
+from .GarbageCollectableConstant import GarbageCollectableConstantType
+from .ConstantTableValue import ConstantTableValueType
+
+# Increase when schema or extracted data changes (index of other version must be removed and created again)
+INDEX_VERSION = 1
+
+# Kinds of string references
+REFERENCE_CONSTANT = 0
+REFERENCE_TABLE_KEY = 1
+REFERENCE_TABLE_VALUE = 2
+REFERENCE_GLOBAL = 3 # GGET/GSET operand
+
+REFERENCES_NAMES = ("constant", "table key", "table value", "global")
+
+_GLOBAL_OPCODES = (OPCODES_MAP["GGET"].value, OPCODES_MAP["GSET"].value)
+
+_SCHEMA = """
+CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, mtime INTEGER, hash TEXT);
+CREATE TABLE strings (id INTEGER PRIMARY KEY, value BLOB UNIQUE NOT NULL);
+CREATE TABLE string_references (string_id INTEGER NOT NULL, file_id INTEGER NOT NULL, prototype INTEGER NOT NULL, kind INTEGER NOT NULL);
+CREATE TABLE opcodes (opcode INTEGER NOT NULL, file_id INTEGER NOT NULL, prototype INTEGER NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX string_references_by_string ON string_references (string_id, kind);
+CREATE INDEX string_references_by_file ON string_references (file_id);
+CREATE INDEX opcodes_by_opcode ON opcodes (opcode);
+CREATE INDEX opcodes_by_file ON opcodes (file_id);
+"""
+
+# Extract searchable data of compiled file.
+# Returns hash of file, list of (string, prototype, kind) and list of (opcode, prototype, count).
+# Prototypes are numbered in file order (see Bytecode.prototypes)
+def extract_file(file_name: str) -> tuple[str, list[tuple[bytes, int, int]], list[tuple[int, int, int]]]:
+  strings = []
+  opcodes = []
+
+  bytecode = Bytecode()
+  with ByteStreamReader.open(file_name) as file_content:
+    hash = hashlib.sha256(file_content.data).hexdigest()
+    bytecode.read(file_content)
+
+  for index, prototype in enumerate(bytecode.prototypes()):
+    gc_constants = prototype.gc_constants
+    for gck in gc_constants:
+      if gck.type == GarbageCollectableConstantType.STRING:
+        strings.append((gck.value, index, REFERENCE_CONSTANT))
+      elif gck.type == GarbageCollectableConstantType.TABLE:
+        for value in gck.value.array:
+          if value.type == ConstantTableValueType.STRING:
+            strings.append((value.value, index, REFERENCE_TABLE_VALUE))
+        for key, value in gck.value.hash:
+          if key.type == ConstantTableValueType.STRING:
+            strings.append((key.value, index, REFERENCE_TABLE_KEY))
+          if value.type == ConstantTableValueType.STRING:
+            strings.append((value.value, index, REFERENCE_TABLE_VALUE))
+
+    instructions = prototype.instructions
+    if not isinstance(instructions, InstructionList):
+      instructions = InstructionList(instructions)
+    # lowest byte of little-endian word is opcode
+    opcodes_bytes = instructions.to_bytes()[::4]
+    counts = Counter(opcodes_bytes)
+    opcodes.extend((opcode, index, count) for opcode, count in counts.items())
+
+    if any(opcode in counts for opcode in _GLOBAL_OPCODES):
+      words = instructions.words
+      for pc, opcode in enumerate(opcodes_bytes):
+        if opcode in _GLOBAL_OPCODES:
+          d = words[pc] >> 16
+          if d < len(gc_constants) and gc_constants[d].type == GarbageCollectableConstantType.STRING:
+            strings.append((gc_constants[d].value, index, REFERENCE_GLOBAL))
+
+  return hash, strings, opcodes
+
+def _extract_job(job: tuple[str, int, int]):
+  file_name, size, mtime = job
+  try:
+    return file_name, size, mtime, extract_file(file_name), None
+  except Exception as e:
+    return file_name, size, mtime, None, f"{type(e).__name__}: {e}"
+
+class SearchIndexSummary:
+  indexed: int
+  unchanged: int
+  removed: int
+  failed: list[tuple[str, str]] # (file name, error)
+
+  def __init__(self) -> None:
+    self.indexed = 0
+    self.unchanged = 0
+    self.removed = 0
+    self.failed = []
+
+  def __str__(self) -> str:
+    return f"{self.indexed} files indexed, {self.unchanged} unchanged, {self.removed} removed, {len(self.failed)} failed"
+
+# On-disk (SQLite) inverted index of strings, globals and opcodes of many compiled files
+class SearchIndex:
+  connection: sqlite3.Connection
+
+  # Index is created if file doesn't exist. read_only index must exist and is never changed
+  def __init__(self, file_name: str, read_only: bool = False) -> None:
+    if read_only:
+      if not os.path.isfile(file_name):
+        raise ValueError(f"Index {file_name} doesn't exist")
+      self.connection = sqlite3.connect(f"file:{file_name}?mode=ro", uri=True)
+    else:
+      self.connection = sqlite3.connect(file_name)
+
+    try:
+      try:
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+      except sqlite3.DatabaseError as e:
+        raise ValueError(f"{file_name} is not search index ({e})") from e
+      if version != INDEX_VERSION:
+        # tables of other version or of other database are never dropped
+        has_tables = self.connection.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] > 0
+        if read_only or has_tables:
+          raise ValueError(f"{file_name} is not search index of version {INDEX_VERSION} (version {version}), remove it to create new index")
+        self._create_schema()
+
+      if not read_only:
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+    except:
+      self.connection.close()
+      raise
+
+  def close(self):
+    self.connection.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def _create_schema(self):
+    with self.connection:
+      self.connection.executescript(_SCHEMA)
+      self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+  # Index files (list of file names). Files with same size and modification time are skipped,
+  # files that don't exist anymore are removed from index
+  def update(self, file_names: list[str], workers: int = None, chunksize: int = 16) -> SearchIndexSummary:
+    summary = SearchIndexSummary()
+    connection = self.connection
+
+    known = { path: (file_id, size, mtime, hash) for file_id, path, size, mtime, hash in connection.execute("SELECT id, path, size, mtime, hash FROM files") }
+
+    jobs = []
+    for file_name in file_names:
+      path = os.path.abspath(file_name)
+      try:
+        stat = os.stat(path)
+      except OSError as e:
+        summary.failed.append((file_name, f"{type(e).__name__}: {e}"))
+        continue
+      entry = known.get(path)
+      if entry is not None and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+        summary.unchanged += 1
+        continue
+      jobs.append((path, stat.st_size, stat.st_mtime_ns))
+
+    if workers == 1 or len(jobs) < 2:
+      results = map(_extract_job, jobs)
+      executor = None
+    else:
+      from concurrent.futures import ProcessPoolExecutor
+      executor = ProcessPoolExecutor(max_workers=workers)
+      results = executor.map(_extract_job, jobs, chunksize=chunksize)
+
+    try:
+      with connection:
+        for path, size, mtime, extracted, error in results:
+          if error is not None:
+            summary.failed.append((path, error))
+            continue
+          hash, strings, opcodes = extracted
+
+          entry = known.get(path)
+          if entry is not None and entry[3] == hash:
+            # only modification time is changed
+            connection.execute("UPDATE files SET size = ?, mtime = ? WHERE id = ?", (size, mtime, entry[0]))
+            summary.unchanged += 1
+            continue
+
+          if entry is not None:
+            self._remove_file(entry[0])
+          file_id = connection.execute("INSERT INTO files (path, size, mtime, hash) VALUES (?, ?, ?, ?)", (path, size, mtime, hash)).lastrowid
+          self._add_strings(file_id, strings)
+          connection.executemany("INSERT INTO opcodes (opcode, file_id, prototype, count) VALUES (?, ?, ?, ?)",
+                                 [(opcode, file_id, prototype, count) for opcode, prototype, count in opcodes])
+          summary.indexed += 1
+
+        for path, (file_id, _, _, _) in known.items():
+          if not os.path.exists(path):
+            self._remove_file(file_id)
+            summary.removed += 1
+
+        if summary.removed > 0 or len(known) > 0 and summary.indexed > 0:
+          # strings, that are not referenced by any file
+          connection.execute("DELETE FROM strings WHERE id NOT IN (SELECT string_id FROM string_references)")
+    finally:
+      if executor is not None:
+        executor.shutdown()
+
+    return summary
+
+  def _remove_file(self, file_id: int):
+    self.connection.execute("DELETE FROM string_references WHERE file_id = ?", (file_id,))
+    self.connection.execute("DELETE FROM opcodes WHERE file_id = ?", (file_id,))
+    self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+  def _add_strings(self, file_id: int, strings: list[tuple[bytes, int, int]]):
+    connection = self.connection
+    unique = list({ value for value, _, _ in strings })
+    connection.executemany("INSERT OR IGNORE INTO strings (value) VALUES (?)", [(value,) for value in unique])
+
+    ids = {}
+    # sqlite limits number of parameters of statement
+    for start in range(0, len(unique), 500):
+      part = unique[start:start + 500]
+      query = f"SELECT id, value FROM strings WHERE value IN ({','.join('?' * len(part))})"
+      ids.update((value, string_id) for string_id, value in connection.execute(query, part))
+
+    connection.executemany("INSERT INTO string_references (string_id, file_id, prototype, kind) VALUES (?, ?, ?, ?)",
+                           [(ids[value], file_id, prototype, kind) for value, prototype, kind in strings])
+
+  # Returns list of (file name, prototype index, kind of reference, string).
+  # If contains is True, value is searched as substring
+  def find_string(self, value: bytes, kinds: tuple[int] = None, contains: bool = False) -> list[tuple[str, int, int, bytes]]:
+    query = ("SELECT files.path, string_references.prototype, string_references.kind, strings.value FROM strings "
+             "JOIN string_references ON string_references.string_id = strings.id "
+             "JOIN files ON files.id = string_references.file_id ")
+    query += "WHERE instr(strings.value, ?) > 0" if contains else "WHERE strings.value = ?"
+    parameters = [value]
+    if kinds is not None:
+      query += f" AND string_references.kind IN ({','.join('?' * len(kinds))})"
+      parameters.extend(kinds)
+    query += " ORDER BY files.path, string_references.prototype"
+    return self.connection.execute(query, parameters).fetchall()
+
+  def find_global(self, name: bytes) -> list[tuple[str, int, int, bytes]]:
+    return self.find_string(name, (REFERENCE_GLOBAL,))
+
+  # Returns list of (file name, prototype index, number of instructions)
+  def find_opcode(self, opcode: int) -> list[tuple[str, int, int]]:
+    return self.connection.execute(
+      "SELECT files.path, opcodes.prototype, opcodes.count FROM opcodes "
+      "JOIN files ON files.id = opcodes.file_id WHERE opcodes.opcode = ? ORDER BY files.path, opcodes.prototype", (opcode,)).fetchall()
@@ -0,0 +1,24 @@
+from .Utils import DEFAULT_STRING_ENCODINGS
+
+class ListingManifest: pass
+
+# Settings of .luas listing output
+class SerializeOptions:
+  labels: bool # show jumps as labels (L<index of instruction>) instead of relative offsets
+  annotate: bool # show values of constant operands in comments
+  encodings: tuple[str] # encodings tried when string constants are shown (undecodable bytes are escaped)
+  manifest: ListingManifest | None # listings of unchanged prototypes are taken from it (doesn't change output)
+
+  def __init__(self, labels: bool = False, annotate: bool = False, encodings: tuple[str] = None, manifest: ListingManifest = None) -> None:
+    if encodings is None:
+      encodings = DEFAULT_STRING_ENCODINGS
+
+    self.labels = labels
+    self.annotate = annotate
+    self.encodings = tuple(encodings)
+    self.manifest = manifest
+
+  # String describing options, that change output (for caches)
+  def key(self) -> str:
+    flags = ",".join(name for name, enabled in (("labels", self.labels), ("annotate", self.annotate)) if enabled)
+    return f"{flags};{','.join(self.encodings)}"
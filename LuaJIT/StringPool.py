@@ -0,0 +1,31 @@
+from .Utils import transform_bytes_to_user_string, DEFAULT_STRING_ENCODINGS
+
+# Pool of string constants of bytecode: equal strings share single object
+# and are converted to user-friendly form only once
+class StringPool:
+  _strings: dict[bytes, bytes]
+  _user_strings: dict[bytes, str]
+  _user_strings_encodings: tuple[str] # encodings used for strings in _user_strings
+
+  def __init__(self) -> None:
+    self._strings = {}
+    self._user_strings = {}
+    self._user_strings_encodings = DEFAULT_STRING_ENCODINGS
+
+  def __len__(self) -> int:
+    return len(self._strings)
+
+  def intern(self, value: bytes) -> bytes:
+    return self._strings.setdefault(value, value)
+
+  # Cached transform_bytes_to_user_string
+  def to_user_string(self, value: bytes, encodings: tuple[str] = DEFAULT_STRING_ENCODINGS) -> str:
+    if encodings != self._user_strings_encodings:
+      self._user_strings.clear()
+      self._user_strings_encodings = encodings
+
+    result = self._user_strings.get(value)
+    if result is None:
+      result = transform_bytes_to_user_string(value, encodings)
+      self._user_strings[value] = result
+    return result
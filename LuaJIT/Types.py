@@ -1,9 +1,12 @@
 from abc import abstractmethod as AbstractMethod, ABC as AbstractClass
 
+from .SerializeOptions import SerializeOptions
+
 # Interface to bytestream-like object
 class IByteStream(AbstractClass):
   data: bytearray # Raw data
   pointer: int # Pointer (index) where functions will read or write data
+  big_endian: bool # Byte order of words and dwords (uleb128 values don't depend on it)
 
   # If data specified, initializes bytestream with bytes-like object.
   # Otherwise, initializes bytestream with empty bytes
@@ -73,12 +76,34 @@ class IByteStream(AbstractClass):
 
 # Object that can be serialized to user-friendly string
 class Serializable(AbstractClass):
+  __slots__ = ()
+
   @AbstractMethod
   def serialize(self) -> str:
     pass
 
+  # Write serialized object to text sink (callable, that takes string. For example, file.write)
+  # indent is inserted after every new line. options are SerializeOptions (None means default)
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
+    write(self.serialize().replace("\n", "\n" + indent))
+
+# Serializable object, that writes itself to text sink piece by piece
+class StreamSerializable(Serializable):
+  __slots__ = ()
+
+  def serialize(self, options: SerializeOptions = None) -> str:
+    result = []
+    self.serialize_to(result.append, "", options)
+    return "".join(result)
+
+  @AbstractMethod
+  def serialize_to(self, write, indent: str = "", options: SerializeOptions = None):
+    pass
+
 # Object that can be initialized (using read() method!) from bytestream-like object
 class BytesInitializable(AbstractClass):
+  __slots__ = ()
+
   def __init__(self, input: IByteStream):
     if not isinstance(input, IByteStream):
       raise TypeError(f"Invalid type of input. Expected IByteStream, gared '{type(input)}'")
@@ -91,6 +116,8 @@ class BytesInitializable(AbstractClass):
 
 # Object that can be writed to bytestream-like object
 class BytesWritable(AbstractClass):
+  __slots__ = ()
+
   @AbstractMethod
   def write(self, output: IByteStream):
     pass
\ No newline at end of file
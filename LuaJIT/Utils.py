@@ -1,15 +1,71 @@
-import numpy
+import re
+import struct
 
-def transform_bytes_to_user_string(data: bytes):
-  try:
-    return data.decode("utf-8")
-  except: pass
+_DOUBLE = struct.Struct("<d")
+_QWORD = struct.Struct("<Q")
 
-  try:
-    return data.decode("cp1251")
-  except: pass
+# Encodings tried (in this order) when string constant is converted to user-friendly string.
+# By default bytes, that aren't valid utf-8, are escaped, so listing can be parsed back exactly.
+# Other encodings (for example, cp1251) are more readable, but listing doesn't say which encoding was used
+DEFAULT_STRING_ENCODINGS = ("utf-8",)
 
-  return str(data)[2:-1]
+# Characters, that are escaped in user-friendly strings (so they can be parsed back)
+_ESCAPES = { code: f"\\x{code:02x}" for code in range(0x20) }
+_ESCAPES.update({
+  0x07: "\\a", 0x08: "\\b", 0x09: "\\t", 0x0a: "\\n", 0x0b: "\\v", 0x0c: "\\f", 0x0d: "\\r",
+  0x22: "\\\"", 0x5c: "\\\\", 0x7f: "\\x7f",
+})
+_ESCAPE_TABLE = str.maketrans(_ESCAPES)
+_NEEDS_ESCAPE = re.compile(r'[\x00-\x1f"\\\x7f]')
+
+# Same, plus bytes, that weren't decoded (latin-1 is used to map them to characters 0x80-0xff)
+_BYTES_ESCAPE_TABLE = str.maketrans(_ESCAPES | { code: f"\\x{code:02x}" for code in range(0x80, 0x100) })
+
+def transform_bytes_to_user_string(data: bytes, encodings: tuple[str] = DEFAULT_STRING_ENCODINGS) -> str:
+  text = None
+
+  # most of strings are pure ascii
+  if data.isascii():
+    text = data.decode("ascii")
+  else:
+    for encoding in encodings:
+      try:
+        text = data.decode(encoding)
+        break
+      except UnicodeDecodeError:
+        pass
+
+  if text is not None:
+    if _NEEDS_ESCAPE.search(text) is None:
+      return text
+    return text.translate(_ESCAPE_TABLE)
+
+  return data.decode("latin-1").translate(_BYTES_ESCAPE_TABLE)
+
+_UNESCAPES = { value[1:]: bytes([code]) for code, value in _ESCAPES.items() if not value.startswith("\\x") }
+_ESCAPE_SEQUENCE = re.compile(r'\\(x[0-9a-fA-F]{2}|.)', re.DOTALL)
+
+# Inverse of transform_bytes_to_user_string. Text between escape sequences is encoded with encoding,
+# \xNN sequences are taken as raw bytes
+def transform_user_string_to_bytes(text: str, encoding: str = DEFAULT_STRING_ENCODINGS[0]) -> bytes:
+  if "\\" not in text:
+    return text.encode(encoding)
+
+  result = bytearray()
+  position = 0
+  for match in _ESCAPE_SEQUENCE.finditer(text):
+    result += text[position:match.start()].encode(encoding)
+    sequence = match.group(1)
+    if sequence[0] == "x" and len(sequence) == 3:
+      result.append(int(sequence[1:], 16))
+    elif sequence in _UNESCAPES:
+      result += _UNESCAPES[sequence]
+    else:
+      raise ValueError(f"Invalid escape sequence (\\{sequence})")
+    position = match.end()
+  result += text[position:].encode(encoding)
+
+  return bytes(result)
 
 def get_instruction_argument(instruction: int, argument_name: str) -> int:
   match argument_name:
@@ -31,10 +87,15 @@ def normalize_number_sign(value: int, size_in_bytes: int) -> int:
     return value
 
 def interpret_int_as_float(int_value: int) -> float:
-  return float(numpy.array([ int_value ], dtype="uint64").view(dtype="double")[0])
+  return _DOUBLE.unpack(_QWORD.pack(int_value & 0xFFFFFFFFFFFFFFFF))[0]
 
 def interpret_float_as_int(float_value: float) -> int:
-  return int(numpy.array([ float_value ], dtype="double").view(dtype="uint64")[0])
+  return _QWORD.unpack(_DOUBLE.pack(float_value))[0]
+
+# Same as interpret_int_as_float, but for many values at once
+def interpret_ints_as_floats(int_values: list[int]) -> tuple[float]:
+  count = len(int_values)
+  return struct.unpack(f"<{count}d", struct.pack(f"<{count}Q", *(value & 0xFFFFFFFFFFFFFFFF for value in int_values)))
 
 def indent_string(text: str, amount: int = 2, indent_symbol: str = " ") -> str:
   return text.replace("\n", "\n" + indent_symbol * amount)
\ No newline at end of file
@@ -0,0 +1,116 @@
+from .Bytecode import Bytecode, BytecodeFlag
+from .ByteStream import ByteStream
+from .ByteStreamReader import ByteStreamReader
+from .GarbageCollectableConstant import GarbageCollectableConstant
+from .Batch import BatchResult
+
+# Round-trip verification: bytecode is read, written back to memory and compared with input
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Returns offset of first differing byte (or None if data is equal).
+# bytearray (ByteStream.data) is compared with other buffers by memcmp without copying,
+# so equal data is checked at once. Otherwise data is compared by chunks to find the difference
+def find_first_difference(expected, actual, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int | None:
+  if isinstance(expected, bytearray) and expected == actual or isinstance(actual, bytearray) and actual == expected:
+    return None
+
+  expected = memoryview(expected).cast("B")
+  actual = memoryview(actual).cast("B")
+  length = min(len(expected), len(actual))
+
+  for start in range(0, length, chunk_size):
+    end = min(start + chunk_size, length)
+    if expected[start:end] != actual[start:end]:
+      for offset, (a, b) in enumerate(zip(expected[start:end], actual[start:end]), start):
+        if a != b:
+          return offset
+
+  if len(expected) != len(actual):
+    return length
+  return None
+
+# Describe what is located at offset of input: header, prototype and its section
+def locate_offset(data, bytecode: Bytecode, offset: int) -> str:
+  if offset >= len(data):
+    return "end of input"
+
+  input = ByteStreamReader(data)
+  input.pointer = 4
+  input.read_uleb128()
+  if not bytecode.flags & BytecodeFlag.StripDebugInfo:
+    input.pointer += input.read_uleb128()
+  if offset < input.pointer:
+    return "bytecode header"
+
+  for index, prototype in enumerate(bytecode.prototypes()):
+    if prototype.source_offset is None or offset >= prototype.source_offset + prototype.source_length:
+      continue
+    if offset < prototype.source_offset:
+      return f"length of prototype #{index}"
+
+    input.pointer = prototype.source_offset
+    return f"prototype #{index} (at {prototype.source_offset:#x}), {_locate_section(input, bytecode, offset)}"
+
+  return "end of bytecode"
+
+def _locate_section(input: ByteStreamReader, bytecode: Bytecode, offset: int) -> str:
+  input.pointer += 3
+  upvalues_count = input.read_byte()
+  gc_constants_count = input.read_uleb128()
+  nm_constants_count = input.read_uleb128()
+  instructions_count = input.read_uleb128()
+  if not bytecode.flags & BytecodeFlag.StripDebugInfo:
+    if input.read_uleb128() != 0:
+      input.read_uleb128()
+      input.read_uleb128()
+  if offset < input.pointer:
+    return "header"
+
+  input.pointer += instructions_count * 4
+  if offset < input.pointer:
+    return f"instruction {(offset - input.pointer) // 4 + instructions_count}"
+
+  input.pointer += upvalues_count * 2
+  if offset < input.pointer:
+    return f"upvalue ^{(offset - input.pointer) // 2 + upvalues_count}"
+
+  # constants are stored in reverse order
+  for index in reversed(range(gc_constants_count)):
+    GarbageCollectableConstant.skip(input)
+    if offset < input.pointer:
+      return f"constant @{index}"
+
+  for index in range(nm_constants_count):
+    _, is_float = input.read_uleb128_33()
+    if is_float:
+      input.read_uleb128()
+    if offset < input.pointer:
+      return f"number #{index}"
+
+  return "debug info"
+
+# Verify single file. Returns size of file and description of first difference (None if file is reproduced exactly)
+def verify_file(input_file_name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[int, str | None]:
+  bytecode = Bytecode()
+  with ByteStreamReader.open(input_file_name) as file_content:
+    bytecode.read(file_content)
+
+    output = ByteStream()
+    bytecode.write(output)
+
+    offset = find_first_difference(output.data, file_content.data, chunk_size)
+    if offset is None:
+      return len(file_content.data), None
+
+    return len(file_content.data), (f"output differs at {offset:#x} ({locate_offset(file_content.data, bytecode, offset)}), "
+                                    f"size {len(output.data)} instead of {len(file_content.data)}")
+
+# Job for run_batch (see Batch.py)
+def verify_job(job: tuple[str, str]) -> BatchResult:
+  input_file_name, _ = job
+  try:
+    size, difference = verify_file(input_file_name)
+    return BatchResult(input_file_name, None, size, error=difference)
+  except Exception as e:
+    return BatchResult(input_file_name, None, error=f"{type(e).__name__}: {e}")
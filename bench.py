@@ -0,0 +1,219 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from LuaJIT.Bytecode import Bytecode
+from LuaJIT.ByteStream import ByteStream
+from LuaJIT.ByteStreamReader import ByteStreamReader
+from LuaJIT.ConstantTable import ConstantTable
+from LuaJIT.ConstantTableValue import ConstantTableValue, ConstantTableValueType
+from LuaJIT.GarbageCollectableConstant import GarbageCollectableConstant, GarbageCollectableConstantType
+from LuaJIT.Instruction import Instruction
+from LuaJIT.InstructionList import InstructionList
+from LuaJIT.Prototype import Prototype
+
+class Shape:
+  instructions: int # per prototype
+  depth: int # nesting depth of child prototypes
+  children: int # child prototypes per prototype (except deepest ones)
+  strings: int # string constants per prototype
+  string_length: int
+  numbers: int # numeric constants per prototype
+  tables: int # table constants per prototype
+  table_size: int # number of array and hash entries in every table
+  seed: int
+
+  def __init__(self, instructions: int = 1000, depth: int = 2, children: int = 4,
+               strings: int = 64, string_length: int = 16, numbers: int = 16,
+               tables: int = 2, table_size: int = 8, seed: int = 0) -> None:
+    self.instructions = instructions
+    self.depth = depth
+    self.children = children
+    self.strings = strings
+    self.string_length = string_length
+    self.numbers = numbers
+    self.tables = tables
+    self.table_size = table_size
+    self.seed = seed
+
+def _random_string(rnd: random.Random, length: int) -> bytes:
+  return bytes(rnd.choice(b"abcdefghijklmnopqrstuvwxyz_0123456789") for _ in range(length))
+
+def _make_table(rnd: random.Random, shape: Shape) -> ConstantTable:
+  table = ConstantTable()
+  for _ in range(shape.table_size):
+    table.array.append(ConstantTableValue(type=ConstantTableValueType.INT32, value=rnd.randrange(1 << 16)))
+  for _ in range(shape.table_size):
+    key = ConstantTableValue(type=ConstantTableValueType.STRING, value=_random_string(rnd, shape.string_length))
+    table.hash.append((key, ConstantTableValue(type=ConstantTableValueType.TRUE)))
+  return table
+
+def _make_instructions(rnd: random.Random, shape: Shape, strings: int, numbers: int, childs: int) -> InstructionList:
+  instructions = InstructionList()
+  count = max(shape.instructions - 1, 0)
+  for pc in range(count):
+    kind = rnd.randrange(8)
+    if kind == 0 and strings > 0:
+      instruction = Instruction(opcode="GGET", a=rnd.randrange(8), d=rnd.randrange(strings))
+    elif kind == 1 and strings > 0:
+      instruction = Instruction(opcode="TGETS", a=rnd.randrange(8), b=rnd.randrange(8), c=rnd.randrange(min(strings, 256)))
+    elif kind == 2 and numbers > 0:
+      instruction = Instruction(opcode="KNUM", a=rnd.randrange(8), d=rnd.randrange(numbers))
+    elif kind == 3 and childs > 0:
+      instruction = Instruction(opcode="FNEW", a=rnd.randrange(8), d=rnd.randrange(childs))
+    elif kind == 4:
+      # jump somewhere inside of prototype (jump distance is limited by 16-bit argument)
+      target = rnd.randrange(max(pc - 30000, 0), min(pc + 30000, count) + 1)
+      instruction = Instruction(opcode="JMP", a=rnd.randrange(8), d=target - pc + 32767)
+    elif kind == 5:
+      instruction = Instruction(opcode="CALL", a=rnd.randrange(8), b=rnd.randrange(4), c=rnd.randrange(4))
+    elif kind == 6:
+      instruction = Instruction(opcode="ADDVV", a=rnd.randrange(8), b=rnd.randrange(8), c=rnd.randrange(8))
+    else:
+      instruction = Instruction(opcode="MOV", a=rnd.randrange(8), d=rnd.randrange(8))
+    instructions.append(instruction)
+  instructions.append(Instruction(opcode="RET0", a=0, d=1))
+  return instructions
+
+def _make_prototype(bytecode: Bytecode, rnd: random.Random, shape: Shape, depth: int) -> Prototype:
+  prototype = Prototype(parent_bytecode=bytecode)
+  prototype.parameters_number = rnd.randrange(4)
+  prototype.frame_size = 8
+
+  if depth > 0:
+    for _ in range(shape.children):
+      child = _make_prototype(bytecode, rnd, shape, depth - 1)
+      child.parent_prototype = prototype
+      prototype.child_prototypes.append(child)
+      prototype.gc_constants.append(GarbageCollectableConstant(type=GarbageCollectableConstantType.CHILD, value=child, parent_prototype=prototype))
+    prototype.flags |= 0x01
+
+  for _ in range(shape.strings):
+    value = _random_string(rnd, shape.string_length)
+    prototype.gc_constants.append(GarbageCollectableConstant(type=GarbageCollectableConstantType.STRING, value=value, parent_prototype=prototype))
+  for _ in range(shape.tables):
+    prototype.gc_constants.append(GarbageCollectableConstant(type=GarbageCollectableConstantType.TABLE, value=_make_table(rnd, shape), parent_prototype=prototype))
+
+  for i in range(shape.numbers):
+    prototype.nm_constants.append(rnd.random() * 1000 if i % 2 else rnd.randrange(-1000, 1000))
+
+  prototype.upvalues = [0x8000 | i for i in range(rnd.randrange(4))]
+  prototype.instructions = _make_instructions(rnd, shape, len(prototype.gc_constants), shape.numbers, len(prototype.child_prototypes))
+  return prototype
+
+# Generate synthetic bytecode of specified shape
+def generate_bytecode(shape: Shape) -> Bytecode:
+  rnd = random.Random(shape.seed)
+  bytecode = Bytecode()
+  bytecode.global_chunk = _make_prototype(bytecode, rnd, shape, shape.depth)
+  return bytecode
+
+def count_instructions(prototype: Prototype) -> int:
+  return len(prototype.instructions) + sum(count_instructions(child) for child in prototype.child_prototypes)
+
+def _read(data: bytes) -> Bytecode:
+  bytecode = Bytecode()
+  bytecode.read(ByteStreamReader(data))
+  return bytecode
+
+def _serialize(bytecode: Bytecode) -> int:
+  size = 0
+  def write(text: str):
+    nonlocal size
+    size += len(text)
+  bytecode.serialize_to(write)
+  return size
+
+def _write(bytecode: Bytecode) -> int:
+  output = ByteStream()
+  bytecode.write(output)
+  return len(output.data)
+
+# Run function several times. Returns timings and peak memory (measured in separate run)
+def measure(function, repeat: int) -> dict:
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - start)
+
+  tracemalloc.start()
+  function()
+  _, peak_memory = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return {
+    "best": min(timings),
+    "mean": sum(timings) / len(timings),
+    "peak_memory": peak_memory,
+  }
+
+def run_benchmarks(shape: Shape, repeat: int, phases: list[str]) -> dict:
+  bytecode = generate_bytecode(shape)
+  output = ByteStream()
+  bytecode.write(output)
+  data = bytes(output.data)
+
+  instructions = count_instructions(bytecode.global_chunk)
+  parsed = _read(data)
+  listing_size = _serialize(parsed)
+
+  functions = {
+    "read": lambda: _read(data),
+    "serialize": lambda: _serialize(parsed),
+    "write": lambda: _write(parsed),
+  }
+
+  results = {}
+  for phase in phases:
+    result = measure(functions[phase], repeat)
+    result["mb_per_s"] = len(data) / result["best"] / (1024 * 1024)
+    result["instructions_per_s"] = instructions / result["best"]
+    results[phase] = result
+
+  return {
+    "shape": vars(shape),
+    "bytecode_size": len(data),
+    "listing_size": listing_size,
+    "instructions": instructions,
+    "repeat": repeat,
+    "python": platform.python_version(),
+    "results": results,
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark read, serialize and write of synthetic LuaJIT bytecode")
+  parser.add_argument("--instructions", type=int, default=1000, help="instructions per prototype")
+  parser.add_argument("--depth", type=int, default=2, help="nesting depth of child prototypes")
+  parser.add_argument("--children", type=int, default=4, help="child prototypes per prototype")
+  parser.add_argument("--strings", type=int, default=64, help="string constants per prototype")
+  parser.add_argument("--string-length", type=int, default=16)
+  parser.add_argument("--numbers", type=int, default=16, help="numeric constants per prototype")
+  parser.add_argument("--tables", type=int, default=2, help="table constants per prototype")
+  parser.add_argument("--table-size", type=int, default=8)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--phases", default="read,serialize,write", help="comma-separated list of phases")
+  parser.add_argument("-o", "--output", default=None, help="write JSON report to file (default: stdout)")
+  options = parser.parse_args()
+
+  shape = Shape(options.instructions, options.depth, options.children,
+                options.strings, options.string_length, options.numbers,
+                options.tables, options.table_size, options.seed)
+  report = run_benchmarks(shape, options.repeat, options.phases.split(","))
+
+  text = json.dumps(report, indent=2)
+  if options.output is None:
+    print(text)
+  else:
+    with open(options.output, "w", encoding="utf-8") as f:
+      f.write(text + "\n")
+
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,34 +1,277 @@
+import argparse
+import json
 import sys
+from contextlib import contextmanager
 
+from LuaJIT.Batch import disassemble_file, collect_files, run_batch, print_result
 from LuaJIT.Bytecode import Bytecode
 from LuaJIT.ByteStream import ByteStream
+from LuaJIT.ByteStreamReader import ByteStreamReader
+from LuaJIT.DisassemblyCache import DisassemblyCache, DEFAULT_MAX_SIZE
+from LuaJIT.Opcodes import OPCODES_MAP
+from LuaJIT.Profiler import PROFILER
+from LuaJIT.SerializeOptions import SerializeOptions
+from LuaJIT.Verify import verify_job
+from LuaJIT.Utils import DEFAULT_STRING_ENCODINGS, transform_bytes_to_user_string
 
-def main():
-  if len(sys.argv) < 2:
-    print("No input file")
+def add_serialize_arguments(parser: argparse.ArgumentParser):
+  parser.add_argument("--labels", action="store_true", help="show jumps as labels instead of relative offsets")
+  parser.add_argument("--annotate", action="store_true", help="show values of constant operands in comments")
+  parser.add_argument("--encodings", default=",".join(DEFAULT_STRING_ENCODINGS), help="comma-separated encodings tried for string constants, for example utf-8,cp1251 "
+                      "(default: %(default)s, other bytes are escaped as \\xNN)")
+
+def create_serialize_options(options: argparse.Namespace) -> SerializeOptions:
+  return SerializeOptions(labels=options.labels, annotate=options.annotate, encodings=options.encodings.split(","))
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+  parser.add_argument("--cache", metavar="DIRECTORY", default=None, help="reuse output for unchanged files, stored in specified directory")
+  parser.add_argument("--cache-size", metavar="MB", type=int, default=DEFAULT_MAX_SIZE // (1024 * 1024), help="maximal size of cache")
+
+def add_incremental_argument(parser: argparse.ArgumentParser):
+  parser.add_argument("--incremental", action="store_true", help="render only prototypes changed since previous run (listings are kept in .manifest.json next to output)")
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+  parser.add_argument("--profile", action="store_true", help="print time spent in reading, serializing and writing phases to stderr")
+  parser.add_argument("--profile-memory", action="store_true", help="also trace memory allocated in phases (slows down everything)")
+
+# Enable profiler for the body, if asked. Report is printed even if body fails
+@contextmanager
+def profile(options: argparse.Namespace):
+  if not options.profile and not options.profile_memory:
+    yield
+    return
+
+  PROFILER.enable(trace_memory=options.profile_memory)
+  try:
+    yield
+  finally:
+    print(PROFILER, file=sys.stderr)
+    PROFILER.disable()
+    PROFILER.reset()
+
+def create_cache(options: argparse.Namespace) -> DisassemblyCache | None:
+  if options.cache is None:
+    return None
+  return DisassemblyCache(options.cache, options.cache_size * 1024 * 1024)
+
+def disassemble_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py", description="Disassemble compiled LuaJIT file")
+  parser.add_argument("input", help="compiled lua file")
+  parser.add_argument("output", nargs="?", help="output lua assembly file (default: input + .luas)")
+  add_serialize_arguments(parser)
+  add_cache_arguments(parser)
+  add_incremental_argument(parser)
+  add_profile_arguments(parser)
+  options = parser.parse_args(args)
+
+  with profile(options):
+    cache = create_cache(options)
+    disassemble_file(options.input, options.output, cache, create_serialize_options(options), options.incremental)
+    if cache is not None:
+      cache.evict()
+
+  return 0
+
+def batch_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py batch", description="Disassemble many compiled LuaJIT files in parallel")
+  parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+  parser.add_argument("--chunksize", type=int, default=16, help="number of files sent to worker at once")
+  parser.add_argument("-o", "--output-dir", default=None, help="directory for .luas files (default: next to input files)")
+  parser.add_argument("--extension", action="append", default=None, help="extension of files searched in directories (default: .luac)")
+  add_serialize_arguments(parser)
+  add_cache_arguments(parser)
+  add_incremental_argument(parser)
+  add_profile_arguments(parser)
+  options = parser.parse_args(args)
+
+  extensions = tuple(options.extension) if options.extension else (".luac",)
+  try:
+    jobs = collect_files(options.paths, options.output_dir, extensions)
+  except ValueError as e:
+    print(f"error: {e}", file=sys.stderr)
     return 1
+  with profile(options):
+    summary = run_batch(jobs, options.jobs, options.chunksize, print_result, create_cache(options), create_serialize_options(options),
+                        incremental=options.incremental)
+  print(summary)
 
-  input_file_name = sys.argv[1]
-  output_file_name = None
+  return 0 if summary.failed == 0 else 1
 
-  if len(sys.argv) < 3:
-    output_file_name = input_file_name + ".luas"
-  else:
-    output_file_name = sys.argv[3]
+def export_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py export", description="Export parsed LuaJIT file for other tools")
+  parser.add_argument("input", help="compiled lua file")
+  parser.add_argument("output", nargs="?", help="output file (default: input + .ndjson or .ljbx)")
+  parser.add_argument("-f", "--format", choices=("ndjson", "binary"), default="ndjson", help="newline-delimited JSON or binary columnar form (default: %(default)s)")
+  options = parser.parse_args(args)
 
-  file_content = None
-  with open(input_file_name, "rb") as f:
-    file_content = ByteStream(f.read())
-    f.close()
+  output_file_name = options.output
+  if output_file_name is None:
+    output_file_name = options.input + (".ndjson" if options.format == "ndjson" else ".ljbx")
 
   bytecode = Bytecode()
-  bytecode.read(file_content)
+  with ByteStreamReader.open(options.input) as file_content:
+    bytecode.read(file_content)
+
+  if options.format == "ndjson":
+    with open(output_file_name, "w", encoding="utf-8") as f:
+      bytecode.export_ndjson(f.write)
+  else:
+    with open(output_file_name, "wb") as f:
+      bytecode.export_binary(f.write)
+
+  return 0
+
+def assemble_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py assemble", description="Assemble lua assembly file back to compiled LuaJIT file")
+  parser.add_argument("input", help="lua assembly file")
+  parser.add_argument("output", nargs="?", help="output compiled lua file (default: input + .luac)")
+  parser.add_argument("--encoding", default=DEFAULT_STRING_ENCODINGS[0], help="encoding of text of string constants, escaped bytes are taken as is (default: %(default)s). "
+                      "Listing must be disassembled with same single encoding to be assembled back exactly")
+  options = parser.parse_args(args)
+
+  # imported here, because only this command needs assembler
+  from LuaJIT.Assembler import assemble
+
+  output_file_name = options.output
+  if output_file_name is None:
+    output_file_name = options.input + ".luac"
+
+  with open(options.input, "r", encoding="utf-8") as f:
+    bytecode = assemble(f, options.encoding)
 
-  with open(output_file_name, "w+", encoding="utf-8") as f:
-    f.write(bytecode.serialize())
-    f.close()
+  output = ByteStream()
+  bytecode.write(output)
+  with open(output_file_name, "wb") as f:
+    f.write(output.data)
 
   return 0
 
+def verify_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py verify", description="Check that compiled LuaJIT files are written back byte to byte")
+  parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+  parser.add_argument("--chunksize", type=int, default=16, help="number of files sent to worker at once")
+  parser.add_argument("--extension", action="append", default=None, help="extension of files searched in directories (default: .luac)")
+  options = parser.parse_args(args)
+
+  extensions = tuple(options.extension) if options.extension else (".luac",)
+  jobs = collect_files(options.paths, None, extensions)
+  summary = run_batch(jobs, options.jobs, options.chunksize, print_result, job_function=verify_job, action="verified")
+  print(summary)
+
+  return 0 if summary.failed == 0 else 1
+
+def index_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py index", description="Add compiled LuaJIT files to search index (changed files are re-indexed, removed ones are dropped)")
+  parser.add_argument("database", help="index file (SQLite database)")
+  parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+  parser.add_argument("--chunksize", type=int, default=16, help="number of files sent to worker at once")
+  parser.add_argument("--extension", action="append", default=None, help="extension of files searched in directories (default: .luac)")
+  options = parser.parse_args(args)
+
+  # imported here, because sqlite3 is needed only for index and query commands
+  from LuaJIT.SearchIndex import SearchIndex
+
+  extensions = tuple(options.extension) if options.extension else (".luac",)
+  file_names = [input_file_name for input_file_name, _ in collect_files(options.paths, None, extensions)]
+  try:
+    index = SearchIndex(options.database)
+  except ValueError as e:
+    print(f"error: {e}", file=sys.stderr)
+    return 2
+  with index:
+    summary = index.update(file_names, options.jobs, options.chunksize)
+
+  for file_name, error in summary.failed:
+    print(f"error: {file_name}: {error}", file=sys.stderr)
+  print(summary)
+
+  return 0 if len(summary.failed) == 0 else 1
+
+def query_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py query", description="Search in index, made by index command")
+  parser.add_argument("database", help="index file (SQLite database)")
+  group = parser.add_mutually_exclusive_group(required=True)
+  group.add_argument("--string", help="files referencing string constant (also in tables)")
+  group.add_argument("--contains", help="files referencing string constant, that contains this text")
+  group.add_argument("--global", dest="global_name", help="files reading or writing global variable (GGET/GSET)")
+  group.add_argument("--opcode", help="files using opcode (for example, KCDATA)")
+  parser.add_argument("--files", action="store_true", help="show only names of files")
+  options = parser.parse_args(args)
+
+  from LuaJIT.SearchIndex import SearchIndex, REFERENCES_NAMES
+
+  try:
+    index = SearchIndex(options.database, read_only=True)
+  except ValueError as e:
+    print(f"error: {e}", file=sys.stderr)
+    return 2
+  with index:
+    if options.opcode is not None:
+      opcode_info = OPCODES_MAP.get(options.opcode.upper())
+      if opcode_info is None:
+        print(f"error: unknown opcode {options.opcode}", file=sys.stderr)
+        return 2
+      results = [(path, f"prototype #{prototype}: {count} instructions") for path, prototype, count in index.find_opcode(opcode_info.value)]
+    else:
+      if options.string is not None:
+        matches = index.find_string(options.string.encode("utf-8"))
+      elif options.contains is not None:
+        matches = index.find_string(options.contains.encode("utf-8"), contains=True)
+      else:
+        matches = index.find_global(options.global_name.encode("utf-8"))
+      results = [(path, f"prototype #{prototype}: {REFERENCES_NAMES[kind]} \"{transform_bytes_to_user_string(value)}\"")
+                 for path, prototype, kind, value in matches]
+
+  if options.files:
+    for path in dict.fromkeys(path for path, _ in results):
+      print(path)
+  else:
+    for path, description in results:
+      print(f"{path}: {description}")
+
+  return 0 if len(results) > 0 else 1
+
+def stats_main(args: list[str]) -> int:
+  parser = argparse.ArgumentParser(prog="main.py stats", description="Statistics of opcodes and constants of compiled LuaJIT files (requires numpy)")
+  parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+  parser.add_argument("--chunksize", type=int, default=64, help="number of files processed by worker at once")
+  parser.add_argument("--extension", action="append", default=None, help="extension of files searched in directories (default: .luac)")
+  parser.add_argument("--json", action="store_true", help="print statistics as JSON")
+  options = parser.parse_args(args)
+
+  # imported here, because numpy is needed only for this command
+  from LuaJIT.CorpusStatistics import collect_statistics
+
+  extensions = tuple(options.extension) if options.extension else (".luac",)
+  file_names = [input_file_name for input_file_name, _ in collect_files(options.paths, None, extensions)]
+  statistics = collect_statistics(file_names, options.jobs, options.chunksize, lambda file_name, error: print(f"error: {file_name}: {error}", file=sys.stderr))
+
+  if options.json:
+    print(json.dumps(statistics.to_dict(), indent=2))
+  else:
+    print(statistics)
+
+  return 0 if statistics.failed == 0 else 1
+
+COMMANDS = {
+  "batch": batch_main,
+  "export": export_main,
+  "assemble": assemble_main,
+  "verify": verify_main,
+  "index": index_main,
+  "query": query_main,
+  "stats": stats_main,
+}
+
+def main():
+  args = sys.argv[1:]
+  if len(args) > 0 and args[0] in COMMANDS:
+    return COMMANDS[args[0]](args[1:])
+  return disassemble_main(args)
+
 if __name__ == "__main__":
-  exit(main())
\ No newline at end of file
+  exit(main())